@@ -1,22 +1,26 @@
 import os
 import json
+import asyncio
 import pandas as pd
 import tempfile 
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from sqlalchemy.orm import Session
-from app.models.library_data import DataFile, AnalysisReport, ReportExport
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.library_data import DataFile, AnalysisReport, ReportExport, AnalysisPartial
 from app.core.database import get_db
 from app.core.auth import get_current_analyst
 from app.utils.export_report import export_to_pdf, export_to_excel
 from app.core.file_upload import save_upload_file
 from app.models.analyst import Analyst
-from typing import List, Any
+from typing import List, Any, Optional
 from fastapi.responses import FileResponse
-from datetime import datetime
+from datetime import datetime, date
 
 from app.services.library_analysis import (
-    LibraryDataAnalyzer, 
+    ANALYSIS_SECTIONS,
+    SEARCH_MAX_NGRAM,
+    remove_table_cache,
     create_data_file, 
     get_data_files_by_analyst,
     save_analysis_report,
@@ -24,19 +28,91 @@ from app.services.library_analysis import (
     get_report_by_id
 )
 
+from app.services.analyzer_cache import (
+    analyzer_cache,
+    analyze_cached_file,
+    report_cached_file,
+    ingest_data_file,
+    query_cached_cube,
+    preview_cached_file
+)
+from app.services.preview import PREVIEW_SAMPLE_SIZE, PREVIEW_DEFAULT_GROUPS
+from app.services.out_of_core import analyze_out_of_core, OUT_OF_CORE_THRESHOLD_BYTES
+from app.services.olap_cube import CUBE_DIMENSIONS, cube_cache
+from app.services.result_cache import (
+    file_content_hash,
+    section_params,
+    section_as_of,
+    get_section_result,
+    save_section_result,
+    delete_section_results
+)
+from app.services.partial_aggregates import (
+    get_partial_state,
+    save_partial_state,
+    combine_partial_states,
+    compute_file_partial_state
+)
+from app.core.workers import analysis_pool
+from app.core.responses import FastJSONResponse
+from app.utils.datetime_parsing import to_naive_utc
+from app.utils.pagination import (
+    LIST_PAGE_MAX,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    newest_first_page,
+    split_page
+)
+
+from app.services.analysis_jobs import (
+    create_analysis_job,
+    get_analysis_job,
+    get_analysis_jobs_by_analyst,
+    submit_analysis_job,
+    cancel_analysis_job,
+    JOB_COMPLETED
+)
+
 from app.schemas.library_data import (
     DataFileOut, 
     AnalysisReportCreate, 
     AnalysisReportOut,
-    AnalysisReportDetail
+    AnalysisReportDetail,
+    AnalysisJobOut,
+    CombinedAnalysisCreate
 )
 
 router = APIRouter()
 
+def list_page(
+    cursor: Optional[str] = Query(None, description=f"Where the page starts, from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX, description="Page size, all remaining rows when omitted")
+):
+    """Keyset page of a newest-first list endpoint; the next page's cursor is sent in a header"""
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {'cursor': cursor, 'limit': limit}
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+def report_detail_response(report: AnalysisReport):
+    """AnalysisReportDetail body written straight from the stored report, without re-encoding report_data"""
+    return FastJSONResponse({
+        'id': report.id,
+        'report_name': report.report_name,
+        'created_at': report.created_at,
+        'report_data': report.report_data
+    })
+
 @router.post("/upload-data", response_model=DataFileOut)
 async def upload_data_file(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Upload library user data file"""
@@ -44,186 +120,535 @@ async def upload_data_file(
         raise HTTPException(status_code=400, detail="Only JSON files are accepted")
     
     file_path = save_upload_file(file, current_analyst.id)
-    data_file = create_data_file(db, file_path, current_analyst.id, file.filename)
+
+    # Normalise the file once so analysis endpoints can skip JSON parsing; the preview sample,
+    # the borrow cube and the mergeable aggregates for combined reports come from the same pass
+    try:
+        state = await analysis_pool.run(ingest_data_file, file_path)
+    except HTTPException:
+        # Workers are saturated, everything will be built on first use instead
+        state = None
+    except Exception as e:
+        remove_table_cache(file_path)
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"Could not process data file: {str(e)}")
+
+    data_file = await db.run_sync(create_data_file, file_path, current_analyst.id, file.filename)
+    if state is not None:
+        await db.run_sync(save_partial_state, data_file.id, state)
+
     return data_file
 
 @router.get("/data-files", response_model=List[DataFileOut])
 async def get_data_files(
-    db: Session = Depends(get_db),
+    response: Response,
+    page: dict = Depends(list_page),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
-    """Get all data files uploaded by the current analyst"""
-    return get_data_files_by_analyst(db, current_analyst.id)
+    """Get the data files uploaded by the current analyst, newest first"""
+    files, next_cursor = await db.run_sync(get_data_files_by_analyst, current_analyst.id, **page)
+    set_next_cursor(response, next_cursor)
+    return files
 
 @router.post("/analyze", response_model=AnalysisReportOut)
 async def analyze_data(
     report: AnalysisReportCreate,
     file_id: int,
-    db: Session = Depends(get_db),
+    out_of_core: bool = Query(False, description="Stream the file in bounded batches instead of loading it"),
+    approximate: bool = Query(False, description="Use bounded-memory sketches for the top-N lists of an out-of-core analysis"),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
-    """Analyze a data file and save the report"""
-    file = db.query(DataFile).filter(
+    """
+    Analyze a data file and save the report.
+    Files of at least OUT_OF_CORE_THRESHOLD_BYTES (when set) are always analysed out of core;
+    `approximate` only changes out-of-core reports.
+    """
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        report_data = analyzer.generate_comprehensive_report()
+        if OUT_OF_CORE_THRESHOLD_BYTES and os.path.getsize(file.file_path) >= OUT_OF_CORE_THRESHOLD_BYTES:
+            out_of_core = True
+        if out_of_core:
+            report_data = await analysis_pool.run(analyze_out_of_core, file.file_path, approximate=approximate)
+        else:
+            report_data = await analysis_pool.run(report_cached_file, file.id, file.file_path)
 
-        db_report = save_analysis_report(
-            db, 
+        db_report = await db.run_sync(
+            save_analysis_report, 
             report.report_name, 
             report_data, 
             current_analyst.id
         )
         
         return db_report
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@router.post("/analyze/combined", response_model=AnalysisReportOut)
+async def analyze_combined(
+    request: CombinedAnalysisCreate,
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """
+    Build one report over several data files, selected by id or by upload date range
+    (`uploaded_from` inclusive, `uploaded_to` exclusive). Each file is a partition: missing
+    partial aggregates are computed in parallel workers and all partitions are merged into one report.
+    """
+    query = select(DataFile).filter(DataFile.analyst_id == current_analyst.id)
+    if request.file_ids is not None:
+        file_ids = list(dict.fromkeys(request.file_ids))
+        query = query.filter(DataFile.id.in_(file_ids))
+    elif request.uploaded_from is None and request.uploaded_to is None:
+        raise HTTPException(status_code=400, detail="Select data files by id or upload date range")
+    if request.uploaded_from is not None:
+        query = query.filter(DataFile.upload_date >= request.uploaded_from)
+    if request.uploaded_to is not None:
+        query = query.filter(DataFile.upload_date < request.uploaded_to)
+
+    files = (await db.scalars(query.order_by(DataFile.upload_date))).all()
+
+    if request.file_ids is not None and len(files) != len(file_ids):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not files:
+        raise HTTPException(status_code=404, detail="No data files match the selection")
+
+    try:
+        states = {file.id: await db.run_sync(get_partial_state, file.id) for file in files}
+        missing = [file for file in files if states[file.id] is None]
+
+        # Map: partitions without stored aggregates (e.g. uploaded before they existed) are
+        # computed in parallel, at most one per worker so a large selection does not fill the queue
+        limit = asyncio.Semaphore(max(analysis_pool.workers, 1))
+
+        async def map_partition(file):
+            async with limit:
+                return await analysis_pool.run(compute_file_partial_state, file.file_path)
+
+        computed = await asyncio.gather(*(map_partition(file) for file in missing))
+        for file, state in zip(missing, computed):
+            await db.run_sync(save_partial_state, file.id, state)
+            states[file.id] = state
+
+        # Reduce: counts, [sum, count] pairs and cross-tabs add up exactly across partitions
+        report_data = await analysis_pool.run(combine_partial_states, [states[file.id] for file in files])
+        return await db.run_sync(save_analysis_report, request.report_name, report_data, current_analyst.id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze/jobs", response_model=AnalysisJobOut, status_code=202)
+async def create_analysis_job_route(
+    report: AnalysisReportCreate,
+    file_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Start analysing a data file in the background and return the job for status polling"""
+    file = await db.scalar(select(DataFile).filter(
+        DataFile.id == file_id,
+        DataFile.analyst_id == current_analyst.id
+    ))
+    
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    job = await db.run_sync(create_analysis_job, current_analyst.id, file.id, report.report_name)
+    submit_analysis_job(job.id)
+    return job
+
+@router.get("/analyze/jobs", response_model=List[AnalysisJobOut])
+async def get_analysis_jobs(
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Get all analysis jobs of the current analyst"""
+    return await db.run_sync(get_analysis_jobs_by_analyst, current_analyst.id)
+
+@router.get("/analyze/jobs/{job_id}", response_model=AnalysisJobOut)
+async def get_analysis_job_status(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Get status and progress of an analysis job"""
+    job = await db.run_sync(get_analysis_job, job_id, current_analyst.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/analyze/jobs/{job_id}/report", response_model=AnalysisReportDetail)
+async def get_analysis_job_report(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Get the report produced by a completed analysis job"""
+    job = await db.run_sync(get_analysis_job, job_id, current_analyst.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    report = await db.run_sync(get_report_by_id, job.report_id) if job.report_id else None
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_detail_response(report)
+
+@router.post("/analyze/jobs/{job_id}/cancel", response_model=AnalysisJobOut)
+async def cancel_analysis_job_route(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Cancel a queued or running analysis job"""
+    job = await db.run_sync(get_analysis_job, job_id, current_analyst.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await db.run_sync(cancel_analysis_job, job)
+
 @router.get("/reports", response_model=List[AnalysisReportOut])
 async def get_reports(
-    db: Session = Depends(get_db),
+    response: Response,
+    page: dict = Depends(list_page),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
-    """Get all reports created by the current analyst"""
-    return get_reports_by_analyst(db, current_analyst.id)
+    """Get the reports created by the current analyst, newest first, without their report data"""
+    reports, next_cursor = await db.run_sync(get_reports_by_analyst, current_analyst.id, **page)
+    set_next_cursor(response, next_cursor)
+    return reports
 
 @router.get("/reports/{report_id}", response_model=AnalysisReportDetail)
 async def get_report(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Get a specific report by ID"""
-    report = get_report_by_id(db, report_id)
+    report = await db.run_sync(get_report_by_id, report_id)
     
     if not report or report.analyst_id != current_analyst.id:
         raise HTTPException(status_code=404, detail="Report not found")
     
-    return report
+    return report_detail_response(report)
+
+def analysis_filters(
+    date_from: Optional[datetime] = Query(None, alias="from", description="Only activity at or after this time"),
+    date_to: Optional[datetime] = Query(None, alias="to", description="Only activity before this time"),
+    account_type: Optional[List[str]] = Query(None),
+    subscription_status: Optional[List[str]] = Query(None),
+    login_frequency: Optional[List[str]] = Query(None),
+    age_range: Optional[List[str]] = Query(None),
+    education_level: Optional[List[str]] = Query(None),
+    profession: Optional[List[str]] = Query(None),
+    as_of: Optional[date] = Query(None, description="Reference date for login recency and account tenure, defaults to today")
+):
+    """
+    Time window, user segment and reference date shared by the analysis section endpoints.
+    Repeating an attribute accepts any of its values, different attributes must all match.
+    """
+    if date_from is not None and date_to is not None and to_naive_utc(date_from) >= to_naive_utc(date_to):
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+
+    segment = {
+        'account_type': account_type,
+        'subscription_status': subscription_status,
+        'login_frequency': login_frequency,
+        'age_range': age_range,
+        'education_level': education_level,
+        'profession': profession
+    }
+    return {
+        'start': date_from,
+        'end': date_to,
+        'segment': {column: values for column, values in segment.items() if values},
+        'as_of': as_of or date.today()
+    }
+
+async def run_cached_sections(db: AsyncSession, file: DataFile, sections, as_of, **options):
+    """
+    Section results of a data file, served from the result cache when the same file content,
+    parameters, analyzer version and as-of date were computed before; the rest is computed
+    in the worker pool and stored.
+    """
+    content_hash = await analysis_pool.run(file_content_hash, file.file_path)
+
+    results = {}
+    missing = []
+    for section in sections:
+        cached = await db.run_sync(get_section_result, content_hash, section,
+                                   section_params(section, **options), section_as_of(section, as_of))
+        if cached is None:
+            missing.append(section)
+        else:
+            results[section] = cached
+
+    if missing:
+        computed = await analysis_pool.run(analyze_cached_file, file.id, file.file_path, missing,
+                                           as_of=as_of, **options)
+        for section in missing:
+            await db.run_sync(save_section_result, file.id, content_hash, section,
+                              section_params(section, **options), section_as_of(section, as_of), computed[section])
+            results[section] = computed[section]
+
+    return {section: results[section] for section in sections}
 
 @router.get("/analysis/usage-patterns")
 async def get_usage_patterns(
     file_id: int,
-    db: Session = Depends(get_db),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Analyze usage patterns from a specific data file"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        return analyzer.analyze_usage_patterns()
+        sections = await run_cached_sections(db, file, ['usage'], **filters)
+        return FastJSONResponse(sections['usage'])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/analysis/content-performance")
 async def get_content_performance(
     file_id: int,
-    db: Session = Depends(get_db),
+    approximate: bool = Query(False, description="Use bounded-memory sketches for the top-N lists"),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Analyze content performance from a specific data file"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        return analyzer.analyze_content_performance()
+        sections = await run_cached_sections(db, file, ['content'], approximate=approximate, **filters)
+        return FastJSONResponse(sections['content'])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/analysis/user-segments")
 async def get_user_segments(
     file_id: int,
-    db: Session = Depends(get_db),
+    approximate: bool = Query(False, description="Use bounded-memory sketches for the top-N lists"),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Analyze user segments from a specific data file"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        return analyzer.analyze_user_segments()
+        sections = await run_cached_sections(db, file, ['segments'], approximate=approximate, **filters)
+        return FastJSONResponse(sections['segments'])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/analysis/search-patterns")
 async def get_search_patterns(
     file_id: int,
-    db: Session = Depends(get_db),
+    approximate: bool = Query(False, description="Use bounded-memory sketches for the top-N lists"),
+    ngram: int = Query(1, ge=1, le=SEARCH_MAX_NGRAM, description="Number of consecutive words per search term"),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Analyze search patterns from a specific data file"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        return analyzer.analyze_search_patterns()
+        sections = await run_cached_sections(db, file, ['search'], approximate=approximate, ngram=ngram, **filters)
+        return FastJSONResponse(sections['search'])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/analysis/retention")
 async def get_retention_metrics(
     file_id: int,
-    db: Session = Depends(get_db),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Analyze retention metrics from a specific data file"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
-        analyzer = LibraryDataAnalyzer(file.file_path)
-        return analyzer.analyze_retention()
+        sections = await run_cached_sections(db, file, ['retention'], **filters)
+        return FastJSONResponse(sections['retention'])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
         
+@router.get("/analysis/batch")
+async def get_analysis_batch(
+    file_id: int,
+    sections: Optional[List[str]] = Query(None, description="Sections to compute (usage, content, segments, search, retention)"),
+    approximate: bool = Query(False, description="Use bounded-memory sketches for the top-N lists"),
+    ngram: int = Query(1, ge=1, le=SEARCH_MAX_NGRAM, description="Number of consecutive words per search term"),
+    filters: dict = Depends(analysis_filters),
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Compute several analysis sections of a data file in one request"""
+    sections = sections or list(ANALYSIS_SECTIONS)
+    unknown = [section for section in sections if section not in ANALYSIS_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown analysis sections: {', '.join(unknown)}")
+
+    file = await db.scalar(select(DataFile).filter(
+        DataFile.id == file_id,
+        DataFile.analyst_id == current_analyst.id
+    ))
+    
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    try:
+        results = await run_cached_sections(db, file, sections, approximate=approximate, ngram=ngram, **filters)
+        return FastJSONResponse(results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.get("/analysis/preview")
+async def get_analysis_preview(
+    file_id: int,
+    count: Optional[int] = Query(None, ge=1, le=PREVIEW_SAMPLE_SIZE, description="Number of sampled users to analyse"),
+    fraction: Optional[float] = Query(None, gt=0, le=1, description="Share of all users to analyse"),
+    groups: int = Query(PREVIEW_DEFAULT_GROUPS, ge=2, le=30, description="Random groups used for the confidence intervals"),
+    as_of: Optional[date] = Query(None, description="Reference date for login recency and account tenure, defaults to today"),
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """
+    Quick approximate report from the random user sample drawn at upload, with 95% confidence
+    intervals. The sample holds at most PREVIEW_SAMPLE_SIZE users.
+    """
+    if count is not None and fraction is not None:
+        raise HTTPException(status_code=400, detail="Give either count or fraction, not both")
+
+    file = await db.scalar(select(DataFile).filter(
+        DataFile.id == file_id,
+        DataFile.analyst_id == current_analyst.id
+    ))
+    
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        preview = await analysis_pool.run(preview_cached_file, file.id, file.file_path, count, fraction,
+                                          groups, as_of or date.today())
+        return FastJSONResponse(preview)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.get("/analysis/cube")
+async def get_cube_rollup(
+    file_id: int,
+    group_by: Optional[List[str]] = Query(None, description="Dimensions to group by (genre, age_range, account_type, month)"),
+    genre: Optional[List[str]] = Query(None),
+    age_range: Optional[List[str]] = Query(None),
+    account_type: Optional[List[str]] = Query(None),
+    month_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="First month, YYYY-MM"),
+    month_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Last month, YYYY-MM"),
+    db: AsyncSession = Depends(get_db),
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Slice and dice borrows, completions and ratings from the pre-aggregated cube of a data file"""
+    group_by = list(dict.fromkeys(group_by or []))
+    unknown = [dimension for dimension in group_by if dimension not in CUBE_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown cube dimensions: {', '.join(unknown)}")
+
+    file = await db.scalar(select(DataFile).filter(
+        DataFile.id == file_id,
+        DataFile.analyst_id == current_analyst.id
+    ))
+    
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    filters = {'genre': genre, 'age_range': age_range, 'account_type': account_type}
+    try:
+        rollup = await analysis_pool.run(query_cached_cube, file.id, file.file_path, group_by,
+                                         filters, month_from, month_to)
+        return FastJSONResponse(rollup)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.get("/analysis/cache-stats")
+async def get_analyzer_cache_stats(
+    current_analyst: Analyst = Depends(get_current_analyst)
+):
+    """Get hit/miss counters and memory use of the shared analyzer cache and worker pool load"""
+    return {**analyzer_cache.stats(), 'worker_pool': analysis_pool.stats()}
+
 @router.get("/export-report/{report_id}")
 async def export_report(
     report_id: int,
     format: str = Query(..., description="Export format (pdf, csv, json, xlsx)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
-    report = db.query(AnalysisReport).filter(
+    report = await db.scalar(select(AnalysisReport).filter(
         AnalysisReport.id == report_id,
         AnalysisReport.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -280,11 +705,11 @@ async def export_report(
         
     elif format == "xlsx":
         file_path = os.path.join(temp_dir, f"{filename_base}.xlsx")
-        export_to_excel(report.report_data, file_path)
+        await analysis_pool.run(export_to_excel, report.report_data, file_path)
     
     elif format == "pdf":
         file_path = os.path.join(temp_dir, f"{filename_base}.pdf")
-        export_to_pdf(report.report_data, file_path)
+        await analysis_pool.run(export_to_pdf, report.report_data, file_path)
     else:
         raise HTTPException(status_code=400, detail="Unsupported export format")
     
@@ -295,7 +720,7 @@ async def export_report(
         file_path=file_path
     )
     db.add(export_record)
-    db.commit()
+    await db.commit()
 
     media_type_mapping = {
         "pdf": "application/pdf",
@@ -312,51 +737,54 @@ async def export_report(
 
 @router.get("/exports")
 async def get_report_exports(
-    db: Session = Depends(get_db),
+    response: Response,
+    page: dict = Depends(list_page),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
-    """Get all exported reports for the current analyst"""
-    exports = db.query(ReportExport).filter(
-        ReportExport.analyst_id == current_analyst.id
-    ).order_by(ReportExport.created_at.desc()).all()
+    """Get the exported reports of the current analyst, newest first"""
+    query = select(ReportExport).filter(ReportExport.analyst_id == current_analyst.id)
+    query = newest_first_page(query, ReportExport.created_at, ReportExport.id, page['cursor'], page['limit'])
+    exports, next_cursor = split_page((await db.scalars(query)).all(), page['limit'], 'created_at')
+    set_next_cursor(response, next_cursor)
     
     return exports
 
 @router.delete("/reports/{report_id}")
 async def delete_report(
     report_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Delete a specific report by ID"""
-    report = db.query(AnalysisReport).filter(
+    report = await db.scalar(select(AnalysisReport).filter(
         AnalysisReport.id == report_id,
         AnalysisReport.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    db.query(ReportExport).filter(
+    await db.execute(delete(ReportExport).where(
         ReportExport.report_id == report_id
-    ).delete(synchronize_session=False)
+    ).execution_options(synchronize_session=False))
     
-    db.delete(report)
-    db.commit()
+    await db.delete(report)
+    await db.commit()
     
     return {"message": "Report deleted successfully"}
 
 @router.delete("/data-files/{file_id}")
 async def delete_data_file(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Delete a specific data file by ID"""
-    file = db.query(DataFile).filter(
+    file = await db.scalar(select(DataFile).filter(
         DataFile.id == file_id,
         DataFile.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
@@ -366,23 +794,31 @@ async def delete_data_file(
             os.remove(file.file_path)
         except OSError as e:
             print(f"Error deleting file {file.file_path}: {e}")
+    remove_table_cache(file.file_path)
+    analyzer_cache.evict_file(file.id)
+    cube_cache.evict_file(file.id)
+    await db.run_sync(delete_section_results, file_id)
+
+    await db.execute(delete(AnalysisPartial).where(
+        AnalysisPartial.data_file_id == file_id
+    ).execution_options(synchronize_session=False))
 
-    db.delete(file)
-    db.commit()
+    await db.delete(file)
+    await db.commit()
     
     return {"message": "Data file deleted successfully"}
 
 @router.delete("/exports/{export_id}")
 async def delete_export(
     export_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_analyst: Analyst = Depends(get_current_analyst)
 ):
     """Delete a specific report export by ID"""
-    export = db.query(ReportExport).filter(
+    export = await db.scalar(select(ReportExport).filter(
         ReportExport.id == export_id,
         ReportExport.analyst_id == current_analyst.id
-    ).first()
+    ))
     
     if not export:
         raise HTTPException(status_code=404, detail="Export not found")
@@ -393,7 +829,7 @@ async def delete_export(
         except OSError as e:
             print(f"Error deleting export file {export.file_path}: {e}")
     
-    db.delete(export)
-    db.commit()
+    await db.delete(export)
+    await db.commit()
     
     return {"message": "Export deleted successfully"}
\ No newline at end of file
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.analyst import AnalystCreate, AnalystLogin, AnalystOut
-from app.services.analyst import create_analyst, get_analyst_by_email, verify_password
-from app.core.database import SessionLocal
+from app.services.analyst import create_analyst, get_analyst_by_email, hash_password, verify_password
+from app.core.database import get_db
 from datetime import timedelta
 from app.core.auth import get_current_analyst, create_refresh_token
 from app.core.auth import create_access_token, oauth2_scheme, SECRET_KEY, ALGORITHM
@@ -10,24 +11,20 @@ from jose import JWTError, jwt
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/register", response_model=AnalystOut)
-def register(analyst: AnalystCreate, db: Session = Depends(get_db)):
-    db_analyst = get_analyst_by_email(db, analyst.email)
+async def register(analyst: AnalystCreate, db: AsyncSession = Depends(get_db)):
+    db_analyst = await db.run_sync(get_analyst_by_email, analyst.email)
     if db_analyst:
         raise HTTPException(status_code=400, detail="Analyst already exists")
-    return create_analyst(db, analyst)
+    # bcrypt is deliberately slow, hash in the thread pool before the session is used
+    hashed_password = await run_in_threadpool(hash_password, analyst.password)
+    return await db.run_sync(create_analyst, analyst, hashed_password)
 
 @router.post("/login")
-def login(analyst: AnalystLogin, db: Session = Depends(get_db)):
-    db_analyst = get_analyst_by_email(db, analyst.email)
-    if not db_analyst or not verify_password(analyst.password, db_analyst.hashed_password):
+async def login(analyst: AnalystLogin, db: AsyncSession = Depends(get_db)):
+    db_analyst = await db.run_sync(get_analyst_by_email, analyst.email)
+    # bcrypt is deliberately slow, keep it off the event loop
+    if not db_analyst or not await run_in_threadpool(verify_password, analyst.password, db_analyst.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token = create_access_token({"sub": str(db_analyst.id)})
@@ -41,7 +38,7 @@ def login(analyst: AnalystLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/secure-endpoint")
-def secure_stuff(current_user=Depends(get_current_analyst)):
+async def secure_stuff(current_user=Depends(get_current_analyst)):
     return {
         "message": "You are authenticated",
         "user": {
@@ -52,9 +49,9 @@ def secure_stuff(current_user=Depends(get_current_analyst)):
     }
 
 @router.post("/refresh")
-def refresh_token(
+async def refresh_token(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
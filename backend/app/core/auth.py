@@ -3,7 +3,7 @@ from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.models.analyst import Analyst
 import os
@@ -34,9 +34,9 @@ def decode_token(token: str):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_analyst(
+async def get_current_analyst(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Analyst:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,7 +52,7 @@ def get_current_analyst(
     except JWTError:
         raise credentials_exception
 
-    analyst = db.query(Analyst).filter(Analyst.id == int(analyst_id)).first()
+    analyst = await db.get(Analyst, int(analyst_id))
     if analyst is None:
         raise credentials_exception
     return analyst
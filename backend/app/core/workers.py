@@ -0,0 +1,83 @@
+import os
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+load_dotenv()
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+# Jobs allowed to run or wait in the pool before new heavy requests are rejected
+ANALYSIS_QUEUE_LIMIT = int(os.getenv("ANALYSIS_QUEUE_LIMIT", "16"))
+# "thread" shares the in-process analyzer cache, "process" isolates pandas work from the server process
+ANALYSIS_POOL_KIND = os.getenv("ANALYSIS_POOL_KIND", "thread")
+ANALYSIS_RETRY_AFTER_SECONDS = 5
+# Forked processes used to compute the sections of one comprehensive report in parallel, 0 runs them serially
+ANALYSIS_SECTION_PROCESSES = int(os.getenv("ANALYSIS_SECTION_PROCESSES", "0"))
+# Background analysis jobs run in their own threads, queued jobs wait in the executor queue
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+
+
+class AnalysisPool:
+    """
+    Bounded worker pool for CPU-bound analysis and export work.
+    Heavy handlers await `run` so the event loop stays free for light endpoints;
+    when more than `queue_limit` jobs are in flight new ones are rejected with 503.
+    """
+
+    def __init__(self, workers, queue_limit, kind="thread"):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.kind = kind
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in the pool and wait for the result without blocking the event loop"""
+        with self._lock:
+            if self.in_flight >= self.queue_limit:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Analysis workers are busy, please retry later",
+                    headers={"Retry-After": str(ANALYSIS_RETRY_AFTER_SECONDS)},
+                )
+            self.in_flight += 1
+            executor = self._get_executor()
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'in_flight': self.in_flight
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+analysis_pool = AnalysisPool(ANALYSIS_WORKERS, ANALYSIS_QUEUE_LIMIT, ANALYSIS_POOL_KIND)
+
+job_executor = ThreadPoolExecutor(max_workers=ANALYSIS_JOB_WORKERS, thread_name_prefix="analysis-job")
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from app.api import routes, analysis_routes
 from app.core.database import Base, engine
+from app.core.workers import analysis_pool
+from app.services.analysis_jobs import resume_analysis_jobs
+from app.services.result_cache import purge_stale_section_results
+from app.utils.pagination import NEXT_CURSOR_HEADER
 from fastapi.middleware.cors import CORSMiddleware
 import os
 
@@ -23,8 +27,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.on_event("startup")
+def resume_unfinished_jobs():
+    resume_analysis_jobs()
+
+@app.on_event("startup")
+def drop_stale_section_results():
+    purge_stale_section_results()
+
+@app.on_event("shutdown")
+def shutdown_analysis_pool():
+    analysis_pool.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Library Data Analysis API"}
\ No newline at end of file
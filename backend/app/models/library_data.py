@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Boolean, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import datetime
 
 class AnalysisReport(Base):
     __tablename__ = "analysis_reports"
+    # Newest-first listings of an analyst's reports are read straight off this index
+    __table_args__ = (
+        Index("ix_analysis_reports_analyst_created", "analyst_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     analyst_id = Column(Integer, ForeignKey("analysts.id"), nullable=False)
@@ -17,6 +21,9 @@ class AnalysisReport(Base):
 
 class DataFile(Base):
     __tablename__ = "data_files"
+    __table_args__ = (
+        Index("ix_data_files_analyst_uploaded", "analyst_id", "upload_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     analyst_id = Column(Integer, ForeignKey("analysts.id"), nullable=False)
@@ -28,6 +35,9 @@ class DataFile(Base):
 
 class ReportExport(Base):
     __tablename__ = "report_exports"
+    __table_args__ = (
+        Index("ix_report_exports_analyst_created", "analyst_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     report_id = Column(Integer, ForeignKey("analysis_reports.id"))
@@ -38,4 +48,52 @@ class ReportExport(Base):
     
     # Define relationships
     report = relationship("AnalysisReport", back_populates="exports")
-    analyst = relationship("Analyst", back_populates="exports")
\ No newline at end of file
+    analyst = relationship("Analyst", back_populates="exports")
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    analyst_id = Column(Integer, ForeignKey("analysts.id"), nullable=False)
+    data_file_id = Column(Integer, ForeignKey("data_files.id", ondelete="SET NULL"), nullable=True)
+    report_name = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    current_section = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    error = Column(String, nullable=True)
+    report_id = Column(Integer, ForeignKey("analysis_reports.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    analyst = relationship("Analyst")
+
+
+class AnalysisPartial(Base):
+    __tablename__ = "analysis_partials"
+
+    id = Column(Integer, primary_key=True, index=True)
+    data_file_id = Column(Integer, ForeignKey("data_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    state = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class SectionResult(Base):
+    __tablename__ = "section_results"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "section", "params_hash", "analyzer_version", "as_of",
+                         name="uq_section_results_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    data_file_id = Column(Integer, ForeignKey("data_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    content_hash = Column(String, nullable=False)
+    section = Column(String, nullable=False)
+    params_hash = Column(String, nullable=False)
+    params = Column(JSON)
+    analyzer_version = Column(Integer, nullable=False)
+    # Reference date of time-dependent sections, empty for the others
+    as_of = Column(String, nullable=False, default="")
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
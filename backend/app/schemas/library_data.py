@@ -16,6 +16,12 @@ class DataFileOut(BaseModel):
 class AnalysisReportCreate(BaseModel):
     report_name: str
     
+class CombinedAnalysisCreate(BaseModel):
+    report_name: str
+    file_ids: Optional[List[int]] = None
+    uploaded_from: Optional[datetime] = None
+    uploaded_to: Optional[datetime] = None
+    
 class AnalysisReportOut(BaseModel):
     id: int
     report_name: str
@@ -28,4 +34,20 @@ class AnalysisReportDetail(AnalysisReportOut):
     report_data: Dict[str, Any]
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AnalysisJobOut(BaseModel):
+    id: str
+    report_name: str
+    data_file_id: Optional[int]
+    status: str
+    progress: float
+    current_section: Optional[str]
+    error: Optional[str]
+    report_id: Optional[int]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,158 @@
+import uuid
+import datetime
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.core.workers import job_executor, ANALYSIS_SECTION_PROCESSES
+from app.models.library_data import AnalysisJob, DataFile
+from app.services.analyzer_cache import analyzer_cache
+from app.services.library_analysis import save_analysis_report
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Share of the progress bar given to loading the data file, the sections share the rest
+LOAD_PROGRESS = 0.2
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when a cancel was requested"""
+
+
+def create_analysis_job(db: Session, analyst_id: int, data_file_id: int, report_name: str):
+    """Store a new queued analysis job"""
+    job = AnalysisJob(
+        id=str(uuid.uuid4()),
+        analyst_id=analyst_id,
+        data_file_id=data_file_id,
+        report_name=report_name,
+        status=JOB_QUEUED,
+        progress=0.0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_analysis_job(db: Session, job_id: str, analyst_id: int):
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.analyst_id == analyst_id
+    ).first()
+
+
+def get_analysis_jobs_by_analyst(db: Session, analyst_id: int):
+    return db.query(AnalysisJob).filter(
+        AnalysisJob.analyst_id == analyst_id
+    ).order_by(AnalysisJob.created_at.desc()).all()
+
+
+def submit_analysis_job(job_id: str):
+    """Queue a job for execution in the background job workers"""
+    job_executor.submit(run_analysis_job, job_id)
+
+
+def cancel_analysis_job(db: Session, job: AnalysisJob):
+    """
+    Cancel a job. A queued job is cancelled at once, a running one stops
+    before its next section.
+    """
+    if job.status in ACTIVE_JOB_STATUSES:
+        job.cancel_requested = True
+        if job.status == JOB_QUEUED:
+            job.status = JOB_CANCELLED
+            job.finished_at = datetime.datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _finish(db: Session, job: AnalysisJob, status: str, error: str = None):
+    job.status = status
+    job.error = error
+    job.current_section = None
+    job.finished_at = datetime.datetime.utcnow()
+    db.commit()
+
+
+def run_analysis_job(job_id: str):
+    """Run a queued job: load the data file, compute the report section by section and save it"""
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+        if job is None or job.status != JOB_QUEUED or job.cancel_requested:
+            return
+
+        data_file = db.query(DataFile).filter(DataFile.id == job.data_file_id).first()
+        if data_file is None:
+            _finish(db, job, JOB_FAILED, "Data file no longer exists")
+            return
+
+        # Conditional update so a cancel that lands at the same moment is not overwritten
+        claimed = db.query(AnalysisJob).filter(
+            AnalysisJob.id == job_id,
+            AnalysisJob.status == JOB_QUEUED,
+            AnalysisJob.cancel_requested.is_(False)
+        ).update({
+            AnalysisJob.status: JOB_RUNNING,
+            AnalysisJob.started_at: datetime.datetime.utcnow(),
+            AnalysisJob.current_section: "loading",
+            AnalysisJob.progress: 0.0
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return
+        db.refresh(job)
+
+        def progress(section, completed, total):
+            db.refresh(job)
+            if job.cancel_requested:
+                raise JobCancelled()
+            job.current_section = section
+            job.progress = round(LOAD_PROGRESS + (1 - LOAD_PROGRESS) * completed / total, 3)
+            db.commit()
+
+        try:
+            analyzer = analyzer_cache.get(data_file.id, data_file.file_path)
+            report_data = analyzer.generate_comprehensive_report(
+                progress=progress,
+                processes=ANALYSIS_SECTION_PROCESSES
+            )
+            report = save_analysis_report(db, job.report_name, report_data, job.analyst_id)
+        except JobCancelled:
+            _finish(db, job, JOB_CANCELLED)
+            return
+        except Exception as e:
+            db.rollback()
+            _finish(db, job, JOB_FAILED, f"Analysis failed: {str(e)}")
+            return
+
+        job.report_id = report.id
+        job.progress = 1.0
+        _finish(db, job, JOB_COMPLETED)
+    finally:
+        db.close()
+
+
+def resume_analysis_jobs():
+    """Requeue jobs that were queued or running when the server stopped"""
+    db = SessionLocal()
+    try:
+        jobs = db.query(AnalysisJob).filter(AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)).all()
+        for job in jobs:
+            if job.cancel_requested:
+                _finish(db, job, JOB_CANCELLED)
+                continue
+            job.status = JOB_QUEUED
+            job.progress = 0.0
+            job.current_section = None
+            db.commit()
+            submit_analysis_job(job.id)
+    finally:
+        db.close()
@@ -8,12 +8,14 @@ from typing import Optional
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def create_analyst(db: Session, analyst: AnalystCreate):
-    hashed_pw = pwd_context.hash(analyst.password)
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def create_analyst(db: Session, analyst: AnalystCreate, hashed_password: str):
     db_analyst = Analyst(
         analyst_name=analyst.analyst_name,
         email=analyst.email,
-        hashed_password=hashed_pw
+        hashed_password=hashed_password
     )
     db.add(db_analyst)
     db.commit()
@@ -0,0 +1,185 @@
+import os
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from app.core.workers import ANALYSIS_SECTION_PROCESSES
+from app.services.library_analysis import LibraryDataAnalyzer, section_projection
+from app.services.partial_aggregates import compute_partial_state
+from app.services.olap_cube import get_file_cube, query_cube, store_cube
+from app.services.preview import build_ingestion_caches, get_preview_sample, preview_report, PREVIEW_DEFAULT_GROUPS
+
+load_dotenv()
+
+ANALYZER_CACHE_MAX_BYTES = int(os.getenv("ANALYZER_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+class AnalyzerCache:
+    """
+    Process-wide LRU cache of loaded analyzers.
+    Entries are keyed by (file_id, mtime, size) of the data file, so a replaced file is
+    reloaded, and the cache is kept under a byte budget. Analyzers grow as their lazy indexes
+    and derived columns are built, so entries are re-measured whenever the cache is used.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    @staticmethod
+    def _make_key(file_id, file_path):
+        stat = os.stat(file_path)
+        return (file_id, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_id, file_path, columns=None):
+        """
+        Return the analyzer for a data file, loading it on a miss.
+        `columns` (see section_projection) is what the caller needs, None meaning every column;
+        a cached analyzer missing some of them is replaced by one that also loads those.
+        """
+        key = self._make_key(file_id, file_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0].covers(columns):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._enforce_budget()
+                return entry[0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one request loads a given file, concurrent requests wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0].covers(columns):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._enforce_budget()
+                    return entry[0]
+                self.misses += 1
+                cached = entry[0] if entry is not None else None
+
+            try:
+                if cached is not None:
+                    analyzer = cached.with_columns(file_path, columns)
+                else:
+                    analyzer = LibraryDataAnalyzer(file_path, columns=columns)
+                size = analyzer.memory_usage()
+            except Exception:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+
+            with self._lock:
+                self._load_locks.pop(key, None)
+                # Drop older versions (or narrower projections) of the same file before storing the new one
+                for old_key in [k for k in self._entries if k[0] == file_id]:
+                    self._remove(old_key)
+                if size <= self.max_bytes:
+                    self._entries[key] = (analyzer, size)
+                    self._enforce_budget()
+            return analyzer
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def _enforce_budget(self):
+        """Re-measure every entry, then evict least recently used ones until the cache fits its budget"""
+        self.current_bytes = 0
+        for key, (analyzer, _) in self._entries.items():
+            size = analyzer.memory_usage()
+            self._entries[key] = (analyzer, size)
+            self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def enforce_budget(self):
+        """Charge the indexes built since the last access, evicting entries if the cache outgrew its budget"""
+        with self._lock:
+            self._enforce_budget()
+
+    def evict_file(self, file_id):
+        """Remove every cached analyzer of a data file"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == file_id]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'current_bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+analyzer_cache = AnalyzerCache(ANALYZER_CACHE_MAX_BYTES)
+
+
+def analyze_cached_file(file_id, file_path, sections, approximate=False, ngram=1,
+                        start=None, end=None, segment=None, as_of=None):
+    """
+    Run analysis sections on the cached analyzer of a data file, meant to run in the worker pool.
+    `segment` (attribute -> accepted values) limits the users and their activity,
+    `start`/`end` limit borrows, sessions and searches to a time window.
+    Only the columns the sections (and filters) read are loaded.
+    """
+    columns = section_projection(sections, time_window=start is not None or end is not None, segment=segment)
+    analyzer = analyzer_cache.get(file_id, file_path, columns)
+    # Segment first: its indexes are cached on the shared analyzer, the window's are rebuilt per view
+    if segment:
+        analyzer = analyzer.segment(**segment)
+    if start is not None or end is not None:
+        analyzer = analyzer.window(start, end)
+    try:
+        return analyzer.analyze_sections(sections, approximate=approximate, ngram=ngram, as_of=as_of)
+    finally:
+        analyzer_cache.enforce_budget()
+
+
+def report_cached_file(file_id, file_path):
+    """Build the comprehensive report of a data file, meant to run in the worker pool"""
+    try:
+        return analyzer_cache.get(file_id, file_path).generate_comprehensive_report(processes=ANALYSIS_SECTION_PROCESSES)
+    finally:
+        analyzer_cache.enforce_budget()
+
+
+def ingest_data_file(file_path):
+    """
+    Build what is derived from an uploaded file in one pass over it: the table cache, the
+    preview sample and the borrow cube. Returns the file's partial state, to be stored once
+    the data file has an id. Errors are raised, so a file that cannot be analysed is rejected.
+    """
+    analyzer = build_ingestion_caches(file_path)
+    store_cube(file_path, analyzer)
+    return compute_partial_state(analyzer)
+
+
+def query_cached_cube(file_id, file_path, group_by, filters, month_from=None, month_to=None):
+    """Answer a roll-up from the cube of a data file, building the cube from the cached analyzer if needed"""
+    cube = get_file_cube(file_id, file_path, lambda: analyzer_cache.get(file_id, file_path))
+    return query_cube(cube, group_by, filters, month_from, month_to)
+
+
+def preview_cached_file(file_id, file_path, count=None, fraction=None, groups=PREVIEW_DEFAULT_GROUPS, as_of=None):
+    """Estimate the report of a data file from its preview sample, meant to run in the worker pool"""
+    sample, population_users = get_preview_sample(file_path, lambda: analyzer_cache.get(file_id, file_path))
+    return preview_report(sample, population_users, count=count, fraction=fraction, groups=groups, as_of=as_of)
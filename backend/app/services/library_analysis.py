@@ -1,6 +1,9 @@
 import json
 import os
-from sqlalchemy.orm import Session
+import time
+import threading
+import multiprocessing
+from sqlalchemy.orm import Session, load_only
 from typing import Optional, Dict, Any, List
 import pandas as pd
 import numpy as np
@@ -10,12 +13,449 @@ import re
 
 from app.models.library_data import AnalysisReport, DataFile
 from app.models.analyst import Analyst
+from app.utils.json_stream import iter_json_array
+from app.utils.datetime_parsing import parse_datetime_column, to_naive_utc
+from app.utils.table_cache import read_table_cache, write_table_cache, delete_table_cache
+from app.utils.heavy_hitters import SpaceSavingSketch, CHUNK_SIZE
+from app.utils.pagination import newest_first_page, split_page
+
+TABLE_NAMES = ('user_df', 'borrowing_df', 'session_df', 'search_df', 'book_df')
+
+USER_COLUMNS = ('user_id', 'registration_date', 'account_type', 'subscription_status', 'login_frequency',
+                'last_login', 'age_range', 'education_level', 'profession')
+BORROWING_COLUMNS = ('user_id', 'book_id', 'title', 'author', 'genre', 'borrowed_date', 'return_date',
+                     'rating', 'completed')
+SESSION_COLUMNS = ('user_id', 'book_id', 'date', 'duration_minutes', 'pages_read', 'device')
+SEARCH_COLUMNS = ('user_id', 'timestamp', 'query')
+
+# Low-cardinality string columns stored as dictionary-encoded categoricals
+USER_CATEGORY_COLUMNS = ('account_type', 'subscription_status', 'login_frequency',
+                         'age_range', 'education_level', 'profession')
+SESSION_CATEGORY_COLUMNS = ('device',)
+# Book attributes moved from every borrow row into the shared book dimension
+BOOK_COLUMNS = ('title', 'author', 'genre')
+
+# Section name -> analyzer method, used by endpoints that compute several sections at once
+ANALYSIS_SECTIONS = {
+    'usage': 'analyze_usage_patterns',
+    'content': 'analyze_content_performance',
+    'segments': 'analyze_user_segments',
+    'search': 'analyze_search_patterns',
+    'retention': 'analyze_retention'
+}
+
+# User attributes that analyses can be filtered on
+SEGMENT_COLUMNS = USER_CATEGORY_COLUMNS
+
+# Activity tables that can be limited to a time window, and the timestamp they are filtered on
+TIME_COLUMNS = {
+    'borrowing_df': 'borrowed_date',
+    'session_df': 'date',
+    'search_df': 'timestamp'
+}
+
+# Tables and columns each analysis section reads; the loader only loads what the requested sections need
+SECTION_COLUMNS = {
+    'usage': {
+        'user_df': ('last_login',),
+        'session_df': ('date', 'duration_minutes', 'pages_read', 'device')
+    },
+    'content': {
+        'borrowing_df': ('book_id', 'rating', 'completed'),
+        'book_df': ('book_id',) + BOOK_COLUMNS
+    },
+    'segments': {
+        'user_df': ('user_id', 'account_type', 'age_range', 'education_level', 'profession'),
+        'borrowing_df': ('user_id', 'book_id'),
+        'book_df': ('book_id', 'genre')
+    },
+    'search': {
+        'search_df': ('timestamp', 'query')
+    },
+    'retention': {
+        'user_df': ('user_id', 'registration_date'),
+        'session_df': ('user_id',)
+    }
+}
+
+# Sections that can answer their top-N lists from a heavy-hitters sketch
+APPROXIMATE_SECTIONS = ('content', 'segments', 'search')
+# Sections whose results depend on the current time (login recency, account tenure)
+AS_OF_SECTIONS = ('usage', 'retention')
+# Bump whenever a change to the analysis code changes section results, cached results are keyed by it
+ANALYZER_VERSION = 2
+# Counters kept by each sketch, reported counts are at most total / capacity too high
+TOP_K_SKETCH_CAPACITY = 1000
+
+# Report key -> section, in the order sections appear in a comprehensive report
+REPORT_SECTIONS = (
+    ('usage_patterns', 'usage'),
+    ('content_performance', 'content'),
+    ('user_segments', 'segments'),
+    ('search_patterns', 'search'),
+    ('retention_metrics', 'retention')
+)
+
+# Columns derived from the loaded tables, computed on first use and shared read-only
+# instead of being added to the tables: table -> derived column -> function of the table
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+DERIVED_COLUMNS = {
+    'session_df': {
+        'hour': lambda df: df['date'].dt.hour,
+        # Monday is day 0 like DAY_ORDER, sessions without a date get the missing code -1
+        'day_of_week': lambda df: pd.Series(pd.Categorical.from_codes(
+            df['date'].dt.dayofweek.fillna(-1).astype(np.int8), categories=DAY_ORDER), index=df.index)
+    },
+    'search_df': {
+        'hour': lambda df: df['timestamp'].dt.hour
+    },
+    'user_df': {
+        'last_login_naive': lambda df: df['last_login'].dt.tz_localize(None),
+        'registration_date_naive': lambda df: df['registration_date'].dt.tz_localize(None)
+    }
+}
+
+RECENCY_BINS = [0, 7, 30, 90, float('inf')]
+RECENCY_LABELS = ['Last 7 days', '8-30 days', '31-90 days', '90+ days']
+TENURE_BINS = [0, 30, 90, 180, 365, float('inf')]
+TENURE_LABELS = ['< 1 month', '1-3 months', '3-6 months', '6-12 months', '> 1 year']
+SEARCH_STOPWORDS = frozenset(['the', 'a', 'an', 'and', 'in', 'on', 'at', 'for', 'to', 'of', 'with', 'by'])
+SEARCH_WORD_PATTERN = re.compile(r'\b\w+\b')
+# Longest word sequence counted as one search term
+SEARCH_MAX_NGRAM = 3
+
+def clean_for_json(data):
+    """Clean data structure to remove NaN values and make it JSON serializable"""
+    if isinstance(data, dict):
+        cleaned = {}
+        for key, value in data.items():
+            cleaned[key] = clean_for_json(value)
+        return cleaned
+    elif isinstance(data, list):
+        return [clean_for_json(item) for item in data]
+    elif isinstance(data, (np.integer, np.int64)):
+        return int(data)
+    elif isinstance(data, (np.floating, np.float64)):
+        if np.isnan(data):
+            return 0  # or None, depending on your preference
+        return float(data)
+    elif pd.isna(data):
+        return 0  # or None, depending on your preference
+    else:
+        return data
+
+def section_projection(sections, time_window=False, segment=None):
+    """
+    Columns (table -> column tuple) needed to run `sections`, optionally limited to a time
+    window or a user segment; tables that are not needed are left out.
+    """
+    projection = defaultdict(set)
+    for section in sections:
+        for table_name, columns in SECTION_COLUMNS[section].items():
+            projection[table_name].update(columns)
+    if segment:
+        projection['user_df'].update(('user_id',) + tuple(segment))
+        for table_name in TIME_COLUMNS:
+            if table_name in projection:
+                projection[table_name].add('user_id')
+    if time_window:
+        for table_name, column in TIME_COLUMNS.items():
+            if table_name in projection:
+                projection[table_name].add(column)
+    return {table_name: tuple(sorted(columns)) for table_name, columns in projection.items()}
+
+def series_to_native(series):
+    """
+    Series -> {index: value} of plain Python types in one vectorized pass.
+    Missing values become 0, like clean_for_json.
+    """
+    values = series.to_numpy()
+    missing = pd.isna(values)
+    values = values.astype(object)
+    if missing.any():
+        values[missing] = 0
+    return dict(zip(series.index.tolist(), values.tolist()))
+
+def frame_to_native(frame):
+    """DataFrame -> {column: {index: value}} like to_dict(), converted column by column"""
+    return {column: series_to_native(frame[column]) for column in frame.columns.tolist()}
+
+def iter_search_term_counts(queries, ngram=1, chunk_size=CHUNK_SIZE):
+    """
+    Yield a Counter of search terms for each chunk of queries, so only one chunk of text is
+    held at a time. Words are lowercased and stopwords dropped; with `ngram` > 1 the terms are
+    runs of that many consecutive words within one query, stopwords included ("history of
+    rome" stays one trigram), and only runs made entirely of stopwords are dropped.
+    """
+    for start in range(0, len(queries), chunk_size):
+        chunk = queries.iloc[start:start + chunk_size].dropna()
+        if ngram == 1:
+            counts = Counter(SEARCH_WORD_PATTERN.findall(' '.join(chunk.tolist()).lower()))
+            for word in SEARCH_STOPWORDS.intersection(counts):
+                del counts[word]
+        else:
+            counts = Counter()
+            for words in chunk.str.lower().str.findall(SEARCH_WORD_PATTERN):
+                counts.update(' '.join(words[i:i + ngram]) for i in range(len(words) - ngram + 1)
+                              if not SEARCH_STOPWORDS.issuperset(words[i:i + ngram]))
+        yield counts
+
+def count_search_terms(queries, ngram=1, chunk_size=CHUNK_SIZE):
+    """Count the terms of search queries chunk by chunk, skipping stopwords (see iter_search_term_counts)"""
+    counts = Counter()
+    for chunk_counts in iter_search_term_counts(queries, ngram, chunk_size):
+        counts.update(chunk_counts)
+    return counts
+
+def search_terms_sketch(queries, ngram=1, capacity=TOP_K_SKETCH_CAPACITY, chunk_size=CHUNK_SIZE):
+    """Space-Saving sketch of search terms, only one chunk of queries is counted exactly at a time"""
+    sketch = SpaceSavingSketch(capacity)
+    for chunk_counts in iter_search_term_counts(queries, ngram, chunk_size):
+        sketch.update_counts(chunk_counts)
+    return sketch
+
+def values_sketch(values, capacity=TOP_K_SKETCH_CAPACITY):
+    sketch = SpaceSavingSketch(capacity)
+    sketch.update(values)
+    return sketch
+
+def sketch_top(sketch, n):
+    """Top n of a sketch plus the error information reported next to it"""
+    top = sketch.top(n)
+    error = {
+        'max_overcount': int(sketch.max_error(item for item, _ in top)),
+        'error_bound': round(sketch.error_bound(), 2),
+        'capacity': sketch.capacity
+    }
+    return dict(top), error
+
+def _value_counts(values):
+    """
+    value_counts over the integer codes of a categorical, leaving out categories with no rows.
+    Categories are put in order of first appearance before sorting, so ties come out in the
+    same order as value_counts on the equivalent object column.
+    """
+    codes = values.cat.codes.to_numpy()
+    first_seen = pd.unique(codes[codes >= 0])
+    counts = values.value_counts(sort=False).iloc[first_seen]
+    return counts.sort_values(ascending=False)
+
+def first_row_indexer(keys, values):
+    """
+    Position of each of `values` in `keys`, -1 when missing.
+    A key that occurs more than once maps to its first row.
+    """
+    index = pd.Index(keys)
+    if index.is_unique:
+        return index.get_indexer(values)
+    first = ~index.duplicated()
+    positions = np.flatnonzero(first)
+    rows = index[first].get_indexer(values)
+    return np.where(rows >= 0, positions[rows], -1)
+
+def _index_bytes(index):
+    """Memory held by a lazy index: arrays, pandas objects and the containers holding them"""
+    if isinstance(index, np.ndarray):
+        return index.nbytes
+    if isinstance(index, (pd.Series, pd.Index)):
+        return int(index.memory_usage(deep=True))
+    if isinstance(index, dict):
+        return sum(_index_bytes(value) for value in index.values())
+    if isinstance(index, (list, tuple)):
+        return sum(_index_bytes(value) for value in index)
+    return 0
+
+
+def _buffers_to_frame(columns, buffers):
+    """Build a DataFrame from per-column buffers, empty tables keep the previous no-column shape"""
+    if not buffers[columns[0]]:
+        return pd.DataFrame()
+    return pd.DataFrame({column: buffers[column] for column in columns})
+
+def flatten_users(users):
+    """
+    Flatten an iterable of nested user records into the four analysis tables
+    (users, borrowings, reading sessions, searches).
+    Every user is visited once and each field is appended to its own column buffer,
+    so no per-row dicts are created. Works with streamed iterators.
+    """
+    user_cols = {column: [] for column in USER_COLUMNS}
+    borrow_cols = {column: [] for column in BORROWING_COLUMNS}
+    session_cols = {column: [] for column in SESSION_COLUMNS}
+    search_cols = {column: [] for column in SEARCH_COLUMNS}
+
+    (u_id, u_registration, u_account_type, u_subscription, u_login_frequency,
+     u_last_login, u_age, u_education, u_profession) = (user_cols[c].append for c in USER_COLUMNS)
+    (b_user, b_book, b_title, b_author, b_genre, b_borrowed,
+     b_returned, b_rating, b_completed) = (borrow_cols[c].append for c in BORROWING_COLUMNS)
+    s_user, s_book, s_date, s_duration, s_pages, s_device = (session_cols[c].append for c in SESSION_COLUMNS)
+    q_user, q_timestamp, q_query = (search_cols[c].append for c in SEARCH_COLUMNS)
+
+    for user in users:
+        user_id = user['user_id']
+        account = user['account']
+        profile = user['profile']
+        activity = user['activity']
+
+        # Core user data
+        u_id(user_id)
+        u_registration(account['registration_date'])
+        u_account_type(account['account_type'])
+        u_subscription(account['subscription_status'])
+        u_login_frequency(account['login_frequency'])
+        u_last_login(account['last_login'])
+        u_age(profile['age_range'])
+        u_education(profile['education_level'])
+        u_profession(profile['profession'])
+
+        # Book borrowing data
+        for book in activity.get('books_borrowed', []):
+            b_user(user_id)
+            b_book(book['book_id'])
+            b_title(book['title'])
+            b_author(book['author'])
+            b_genre(book['genre'])
+            b_borrowed(book['borrowed_date'])
+            b_returned(book.get('return_date'))
+            b_rating(book.get('rating'))
+            b_completed(book.get('completed', False))
+
+        # Reading sessions data
+        for session in activity.get('reading_sessions', []):
+            s_user(user_id)
+            s_book(session['book_id'])
+            s_date(session['date'])
+            s_duration(session['duration_minutes'])
+            s_pages(session['pages_read'])
+            s_device(session['device'])
+
+        # Search history data
+        for search in activity.get('search_history', []):
+            q_user(user_id)
+            q_timestamp(search['timestamp'])
+            q_query(search['query'])
+
+    return (
+        _buffers_to_frame(USER_COLUMNS, user_cols),
+        _buffers_to_frame(BORROWING_COLUMNS, borrow_cols),
+        _buffers_to_frame(SESSION_COLUMNS, session_cols),
+        _buffers_to_frame(SEARCH_COLUMNS, search_cols)
+    )
 
 class LibraryDataAnalyzer:
-    def __init__(self, data_path):
-        """Initialize with path to data.json file"""
-        self.load_data(data_path)
-        self.initialize_dataframes()
+    def __new__(cls, *args, **kwargs):
+        """
+        Every analyzer, including the bare ones built by window, segment and the loaders,
+        gets its own store of lazy indexes with one lock per index, so building an index
+        only waits for another thread building the same index of the same analyzer.
+        """
+        analyzer = super().__new__(cls)
+        analyzer._indexes = {}
+        analyzer._index_locks = {}
+        analyzer._index_locks_guard = threading.Lock()
+        return analyzer
+
+    def __init__(self, data_path, streaming=True, use_cache=True, reservoir=None, columns=None):
+        """
+        Initialize with path to data.json file.
+        Tables are loaded from the columnar cache next to the file when it is fresh;
+        otherwise the JSON is parsed and the cache is rebuilt.
+        `columns` (table -> columns, see section_projection) limits what is loaded from the
+        cache; tables not listed are left empty. Parsing the JSON always builds every column.
+        In streaming mode users are read from the file one at a time and
+        flattened straight into the tables, so the raw document is never held in memory.
+        A `reservoir` sees every streamed user and keeps a random sample of their positions.
+        """
+        if use_cache and self.load_cached_tables(data_path, columns):
+            return
+
+        self.projection = None
+
+        if streaming:
+            users = iter_json_array(data_path, 'users')
+            if reservoir is not None:
+                users = reservoir.observe(users)
+            self.initialize_dataframes(users)
+        else:
+            self.load_data(data_path)
+            self.initialize_dataframes()
+
+        if use_cache:
+            try:
+                self.save_cached_tables(data_path)
+            except OSError as e:
+                print(f"Could not write table cache for {data_path}: {e}")
+
+    def load_cached_tables(self, data_path, columns=None):
+        """Load flattened tables from the columnar cache, returns False if it is missing or stale"""
+        tables = read_table_cache(data_path, columns)
+        if tables is None:
+            return False
+        for name in TABLE_NAMES:
+            setattr(self, name, tables.get(name, pd.DataFrame()))
+        self.projection = columns
+        return True
+
+    def covers(self, columns):
+        """Whether the loaded columns include `columns` (None meaning every column)"""
+        projection = getattr(self, 'projection', None)
+        if projection is None:
+            return True
+        if columns is None:
+            return False
+        return all(set(needed) <= set(projection.get(table_name, ()))
+                   for table_name, needed in columns.items())
+
+    def with_columns(self, data_path, columns):
+        """
+        Analyzer holding this one's columns plus `columns`, loading only the missing ones from
+        the cache. This analyzer is left untouched, so requests still using it are unaffected.
+        """
+        if columns is None:
+            return LibraryDataAnalyzer(data_path)
+
+        projection = {table_name: set(loaded) for table_name, loaded in self.projection.items()}
+        missing = {}
+        for table_name, needed in columns.items():
+            loaded = projection.setdefault(table_name, set())
+            if set(needed) - loaded:
+                missing[table_name] = [column for column in needed if column not in loaded]
+                loaded.update(needed)
+        projection = {table_name: tuple(sorted(loaded)) for table_name, loaded in projection.items()}
+
+        tables = read_table_cache(data_path, missing)
+        if tables is None:
+            return LibraryDataAnalyzer(data_path, columns=projection)
+
+        extended = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+        for name in TABLE_NAMES:
+            current = getattr(self, name)
+            loaded = tables.get(name)
+            if loaded is None or len(loaded.columns) == 0:
+                setattr(extended, name, current)
+            elif len(current.columns) == 0:
+                setattr(extended, name, loaded)
+            else:
+                setattr(extended, name, pd.concat([current, loaded], axis=1, copy=False))
+        extended.projection = projection
+        return extended
+
+    def save_cached_tables(self, data_path):
+        """Write the flattened tables to the columnar cache next to the data file"""
+        write_table_cache(data_path, {name: getattr(self, name) for name in TABLE_NAMES})
+
+    def memory_usage(self):
+        """
+        Approximate memory used by the analyzer in bytes: its tables plus the lazy indexes and
+        derived columns built so far. Tables never change once loaded, so they are measured once.
+        """
+        table_bytes = self.__dict__.get('_table_bytes')
+        if table_bytes is None:
+            table_bytes = int(sum(getattr(self, name).memory_usage(deep=True).sum()
+                                  for name in TABLE_NAMES if hasattr(self, name)))
+            self._table_bytes = table_bytes
+        return table_bytes + sum(_index_bytes(index) for index in list(self._indexes.values()))
 
     def load_data(self, data_path):
         """Load JSON data from file"""
@@ -23,282 +463,512 @@ class LibraryDataAnalyzer:
             self.raw_data = json.load(file)
         self.users = self.raw_data['users']
 
-    def initialize_dataframes(self):
+    def initialize_dataframes(self, users=None):
         """Convert nested JSON to pandas DataFrames for easier analysis"""
-        # Core user data
-        user_base_data = []
-        for user in self.users:
-            base_data = {
-                'user_id': user['user_id'],
-                'registration_date': user['account']['registration_date'],
-                'account_type': user['account']['account_type'],
-                'subscription_status': user['account']['subscription_status'],
-                'login_frequency': user['account']['login_frequency'],
-                'last_login': user['account']['last_login'],
-                'age_range': user['profile']['age_range'],
-                'education_level': user['profile']['education_level'],
-                'profession': user['profile']['profession']
-            }
-            user_base_data.append(base_data)
-        self.user_df = pd.DataFrame(user_base_data)
+        if users is None:
+            users = self.users
 
-        # Book borrowing data
-        borrowing_data = []
-        for user in self.users:
-            user_id = user['user_id']
-            for book in user['activity'].get('books_borrowed', []):
-                book_data = {
-                    'user_id': user_id,
-                    'book_id': book['book_id'],
-                    'title': book['title'],
-                    'author': book['author'],
-                    'genre': book['genre'],
-                    'borrowed_date': book['borrowed_date'],
-                    'return_date': book.get('return_date'),
-                    'rating': book.get('rating'),
-                    'completed': book.get('completed', False)
-                }
-                borrowing_data.append(book_data)
-        self.borrowing_df = pd.DataFrame(borrowing_data)
-
-        # Reading sessions data
-        session_data = []
-        for user in self.users:
-            user_id = user['user_id']
-            for session in user['activity'].get('reading_sessions', []):
-                session_info = {
-                    'user_id': user_id,
-                    'book_id': session['book_id'],
-                    'date': session['date'],
-                    'duration_minutes': session['duration_minutes'],
-                    'pages_read': session['pages_read'],
-                    'device': session['device']
-                }
-                session_data.append(session_info)
-        self.session_df = pd.DataFrame(session_data)
-
-        # Search history data
-        search_data = []
-        for user in self.users:
-            user_id = user['user_id']
-            for search in user['activity'].get('search_history', []):
-                search_info = {
-                    'user_id': user_id,
-                    'timestamp': search['timestamp'],
-                    'query': search['query']
-                }
-                search_data.append(search_info)
-        self.search_df = pd.DataFrame(search_data)
+        self.user_df, self.borrowing_df, self.session_df, self.search_df = flatten_users(users)
 
         # Process datetime columns in all dataframes
         self.process_datetime_columns()
+        self.encode_categoricals()
 
     def process_datetime_columns(self):
-        """Convert string datetime to datetime objects"""
-        # Process user dataframe
-        datetime_cols = ['registration_date', 'last_login']
-        for col in datetime_cols:
+        """Convert string datetime columns to naive UTC datetimes"""
+        datetime_columns = {
+            'user_df': ['registration_date', 'last_login'],
+            'borrowing_df': ['borrowed_date', 'return_date'],
+            'session_df': ['date'],
+            'search_df': ['timestamp']
+        }
+        for table_name, columns in datetime_columns.items():
+            df = getattr(self, table_name)
+            for col in columns:
+                if col in df.columns:
+                    df[col] = parse_datetime_column(df[col])
+
+    def encode_categoricals(self):
+        """
+        Dictionary-encode repeated strings and move title/author/genre into a book dimension.
+        book_df has one row per book_id category of borrowing_df, so a borrow row's book
+        attributes are found through its book_id code without repeating the strings.
+        """
+        for col in USER_CATEGORY_COLUMNS:
             if col in self.user_df.columns:
-                # Parse with timezone information, then convert to naive datetime
-                self.user_df[col] = pd.to_datetime(self.user_df[col]).dt.tz_localize(None)
-
-        # Process borrowing dataframe
-        if not self.borrowing_df.empty:
-            for col in ['borrowed_date', 'return_date']:
-                if col in self.borrowing_df.columns:
-                    self.borrowing_df[col] = pd.to_datetime(self.borrowing_df[col]).dt.tz_localize(None)
-
-        # Process session dataframe
-        if not self.session_df.empty:
-            if 'date' in self.session_df.columns:
-                self.session_df['date'] = pd.to_datetime(self.session_df['date']).dt.tz_localize(None)
-
-        # Process search dataframe
-        if not self.search_df.empty:
-            if 'timestamp' in self.search_df.columns:
-                self.search_df['timestamp'] = pd.to_datetime(self.search_df['timestamp']).dt.tz_localize(None)
+                self.user_df[col] = self.user_df[col].astype('category')
+        for col in SESSION_CATEGORY_COLUMNS:
+            if col in self.session_df.columns:
+                self.session_df[col] = self.session_df[col].astype('category')
+
+        if self.borrowing_df.empty:
+            self.book_df = pd.DataFrame()
+            return
+
+        book_ids = self.borrowing_df['book_id'].astype('category')
+        books = self.borrowing_df.drop_duplicates('book_id').set_index('book_id')
+        self.book_df = books.reindex(book_ids.cat.categories)[list(BOOK_COLUMNS)].rename_axis('book_id').reset_index()
+        for col in BOOK_COLUMNS:
+            self.book_df[col] = self.book_df[col].astype('category')
+
+        self.borrowing_df = self.borrowing_df.drop(columns=list(BOOK_COLUMNS))
+        self.borrowing_df['book_id'] = book_ids
+
+    def book_attribute(self, name):
+        """Per-borrow values of a book dimension attribute (title, author or genre) as a categorical Series"""
+        book_codes = self.borrowing_df['book_id'].cat.codes.to_numpy()
+        attribute = self.book_df[name].cat
+        codes = attribute.codes.to_numpy()[book_codes]
+        codes[book_codes < 0] = -1
+        return pd.Series(pd.Categorical.from_codes(codes, categories=attribute.categories),
+                         index=self.borrowing_df.index, name=name)
+
+    def genre_by_age_counts(self):
+        """Borrow counts by user age range (rows) and book genre (columns), only combinations that occur"""
+        # Age group of each borrow's user, looked up by row position instead of a merge
+        user_rows = self.borrow_user_rows()
+        age_codes = self.user_df['age_range'].cat.codes.to_numpy()[user_rows]
+        genre_codes = self.book_attribute('genre').cat.codes.to_numpy()
+        valid = (user_rows >= 0) & (age_codes >= 0) & (genre_codes >= 0)
+
+        age_categories = self.user_df['age_range'].cat.categories
+        genre_categories = self.book_df['genre'].cat.categories
+        pair_codes = age_codes[valid].astype(np.int64) * len(genre_categories) + genre_codes[valid]
+        counts = np.bincount(pair_codes, minlength=len(age_categories) * len(genre_categories))
+        genre_by_age = pd.DataFrame(counts.reshape(len(age_categories), len(genre_categories)),
+                                    index=age_categories, columns=genre_categories)
+        # Keep only the age groups and genres that occur, like a groupby would
+        return genre_by_age.loc[genre_by_age.sum(axis=1) > 0, genre_by_age.sum(axis=0) > 0]
+
+    def _lazy_index(self, name, build):
+        """Return an index cached on the analyzer, building it once under its own lock"""
+        index = self._indexes.get(name)
+        if index is None:
+            with self._index_locks_guard:
+                lock = self._index_locks.setdefault(name, threading.Lock())
+            with lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = build()
+                    self._indexes[name] = index
+        return index
+
+    def derived(self, table_name, name):
+        """
+        Read-only column of DERIVED_COLUMNS for a table, computed once per analyzer.
+        Categorical columns are kept as their integer codes and categories.
+        The tables themselves are never modified, so concurrent requests can share an analyzer.
+        """
+        def build():
+            column = DERIVED_COLUMNS[table_name][name](getattr(self, table_name))
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                codes = column.cat.codes.to_numpy(copy=True)
+                codes.flags.writeable = False
+                return codes, column.cat.categories
+            values = column.to_numpy(copy=True)
+            values.flags.writeable = False
+            return values
+
+        values = self._lazy_index(('derived', table_name, name), build)
+        if isinstance(values, tuple):
+            codes, categories = values
+            values = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories))
+        return pd.Series(values, index=getattr(self, table_name).index, name=name, copy=False)
+
+    def time_index(self, table_name):
+        """
+        Sorted timestamps and the row order that sorts them for an activity table.
+        Built once per analyzer on first use; rows without a timestamp are left out.
+        """
+        def build():
+            df = getattr(self, table_name)
+            if df.empty:
+                times = np.array([], dtype='datetime64[ns]')
+            else:
+                times = df[TIME_COLUMNS[table_name]].to_numpy(dtype='datetime64[ns]')
+            order = np.flatnonzero(~np.isnat(times))
+            order = order[np.argsort(times[order], kind='stable')]
+            return times[order], order
+        return self._lazy_index(('time', table_name), build)
+
+    def window(self, start=None, end=None):
+        """
+        Analyzer over the activity between `start` (inclusive) and `end` (exclusive).
+        Borrows, sessions and searches are found by binary search over the time indexes, so
+        the cost grows with the size of the window rather than the table. Users and books are
+        shared with this analyzer unchanged.
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        windowed = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+        windowed.user_df = self.user_df
+        windowed.book_df = self.book_df
+        for table_name in TIME_COLUMNS:
+            df = getattr(self, table_name)
+            times, order = self.time_index(table_name)
+            low = 0 if start is None else np.searchsorted(times, start.to_datetime64(), side='left')
+            high = len(times) if end is None else np.searchsorted(times, end.to_datetime64(), side='left')
+            # Rows keep their original order so ties and first appearances match a full run
+            rows = np.sort(order[low:max(low, high)])
+            setattr(windowed, table_name, df.iloc[rows].reset_index(drop=True) if not df.empty else df)
+        return windowed
+
+    def segment_bitmaps(self, column):
+        """Packed bitmap of the user_df rows holding each value of a user attribute"""
+        def build():
+            values = self.user_df[column]
+            codes = values.cat.codes.to_numpy()
+            return {
+                category: np.packbits(codes == code)
+                for code, category in enumerate(values.cat.categories)
+            }
+        return self._lazy_index(('bitmaps', column), build)
+
+    def user_row_ranges(self, table_name):
+        """
+        Rows of an activity table grouped by user: (order, offsets), where the rows of the
+        user at user_df position i are order[offsets[i]:offsets[i + 1]].
+        Tables are flattened user by user, so order is usually the identity and is then None.
+        """
+        def build():
+            df = getattr(self, table_name)
+            if df.empty:
+                return None, np.zeros(len(self.user_df) + 1, dtype=np.int64)
+            user_rows = first_row_indexer(self.user_df['user_id'], df['user_id'])
+            order = None
+            if len(user_rows) and (np.diff(user_rows) < 0).any():
+                order = np.argsort(user_rows, kind='stable')
+                user_rows = user_rows[order]
+            counts = np.bincount(user_rows[user_rows >= 0], minlength=len(self.user_df))
+            offsets = np.concatenate(([0], np.cumsum(counts)))
+            # Rows of unknown users sort first, skip them
+            offsets += np.count_nonzero(user_rows < 0)
+            return order, offsets
+        return self._lazy_index(('user_rows', table_name), build)
+
+    def segment(self, **filters):
+        """
+        Analyzer over the users matching every filter (attribute -> list of accepted values)
+        and their borrows, sessions and searches.
+        Users are selected by AND-ing the precomputed bitmaps of each attribute (values of one
+        attribute are OR-ed); activity rows are gathered from the user row ranges instead of
+        a merge, so a filter costs time in proportion to the users and rows it selects.
+        """
+        selected = np.full((len(self.user_df) + 7) // 8, 0xFF, dtype=np.uint8)
+        for column, values in filters.items():
+            if not values:
+                continue
+            if column not in SEGMENT_COLUMNS:
+                raise ValueError(f"Unknown segment attribute: {column}")
+            bitmaps = self.segment_bitmaps(column)
+            matched = np.zeros_like(selected)
+            for value in values:
+                if value in bitmaps:
+                    matched |= bitmaps[value]
+            selected &= matched
+        users = np.flatnonzero(np.unpackbits(selected, count=len(self.user_df)))
+        return self.select_users(users)
+
+    def select_users(self, users, keep_row_order=True):
+        """
+        Analyzer over the users at the given user_df positions, in the given order, and their
+        borrows, sessions and searches gathered through the user row ranges.
+        With `keep_row_order` activity rows stay in table order, otherwise they are grouped
+        by user in the order of `users`.
+        """
+        selected = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+        selected.user_df = self.user_df.iloc[users].reset_index(drop=True)
+        selected.book_df = self.book_df
+        for table_name in TIME_COLUMNS:
+            df = getattr(self, table_name)
+            if df.empty:
+                setattr(selected, table_name, df)
+                continue
+            order, offsets = self.user_row_ranges(table_name)
+            starts = offsets[users]
+            lengths = offsets[users + 1] - starts
+            # Concatenate the row ranges of the selected users without a Python loop
+            rows = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+            rows += np.arange(len(rows))
+            if order is not None:
+                rows = order[rows]
+            if keep_row_order:
+                rows = np.sort(rows)
+            setattr(selected, table_name, df.iloc[rows].reset_index(drop=True))
+        return selected
+
+    def borrow_user_rows(self):
+        """Row position in user_df of the user of each borrow, -1 for unknown users"""
+        return first_row_indexer(self.user_df['user_id'], self.borrowing_df['user_id'])
 
     def clean_for_json(self, data):
         """Clean data structure to remove NaN values and make it JSON serializable"""
-        if isinstance(data, dict):
-            cleaned = {}
-            for key, value in data.items():
-                cleaned[key] = self.clean_for_json(value)
-            return cleaned
-        elif isinstance(data, list):
-            return [self.clean_for_json(item) for item in data]
-        elif isinstance(data, (np.integer, np.int64)):
-            return int(data)
-        elif isinstance(data, (np.floating, np.float64)):
-            if np.isnan(data):
-                return 0  # or None, depending on your preference
-            return float(data)
-        elif pd.isna(data):
-            return 0  # or None, depending on your preference
-        else:
-            return data
+        return clean_for_json(data)
 
     # Analysis methods (same as in your original app.py)
-    def analyze_usage_patterns(self):
-        """Analyze user activity patterns"""
+    def analyze_usage_patterns(self, as_of=None):
+        """Analyze user activity patterns, login recency is measured at `as_of` (default now)"""
         results = {}
 
         if not self.session_df.empty:
             # Daily activity pattern (hour of day)
-            self.session_df['hour'] = self.session_df['date'].dt.hour
-            hourly_activity = self.session_df['hour'].value_counts().sort_index()
-            results['hourly_activity'] = hourly_activity.to_dict()
+            hourly_activity = self.derived('session_df', 'hour').value_counts().sort_index()
+            results['hourly_activity'] = series_to_native(hourly_activity)
 
             # Weekly pattern
-            self.session_df['day_of_week'] = self.session_df['date'].dt.day_name()
-            day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            weekly_activity = self.session_df['day_of_week'].value_counts()
-            weekly_activity = weekly_activity.reindex(day_order)
-            results['weekly_activity'] = weekly_activity.to_dict()
+            weekly_activity = self.derived('session_df', 'day_of_week').value_counts()
+            weekly_activity = weekly_activity.reindex(DAY_ORDER)
+            results['weekly_activity'] = series_to_native(weekly_activity)
 
             # Average session duration by device
-            avg_duration = self.session_df.groupby('device')['duration_minutes'].mean()
-            results['avg_duration_by_device'] = avg_duration.to_dict()
+            avg_duration = self.session_df.groupby('device', observed=True)['duration_minutes'].mean()
+            results['avg_duration_by_device'] = series_to_native(avg_duration)
 
             # Average pages read per session
-            avg_pages = self.session_df.groupby('device')['pages_read'].mean()
-            results['avg_pages_by_device'] = avg_pages.to_dict()
+            avg_pages = self.session_df.groupby('device', observed=True)['pages_read'].mean()
+            results['avg_pages_by_device'] = series_to_native(avg_pages)
 
         # User activity recency
-        self.user_df['last_login_naive'] = self.user_df['last_login'].dt.tz_localize(None)
-        self.user_df['days_since_login'] = (datetime.now() - self.user_df['last_login_naive']).dt.days
+        # Depends on as_of, so computed per call rather than memoised
+        now = pd.Timestamp(as_of) if as_of is not None else datetime.now()
+        days_since_login = (now - self.derived('user_df', 'last_login_naive')).dt.days
 
-        recency_segments = pd.cut(self.user_df['days_since_login'],
-                                  bins=[0, 7, 30, 90, float('inf')],
-                                  labels=['Last 7 days', '8-30 days', '31-90 days', '90+ days'])
+        recency_segments = pd.cut(days_since_login,
+                                  bins=RECENCY_BINS,
+                                  labels=RECENCY_LABELS)
         recency_counts = recency_segments.value_counts()
-        results['login_recency'] = recency_counts.to_dict()
+        results['login_recency'] = series_to_native(recency_counts)
 
-        return self.clean_for_json(results)
+        return results
 
-    def analyze_content_performance(self):
-        """Analyze book performance metrics"""
+    def analyze_content_performance(self, approximate=False):
+        """
+        Analyze book performance metrics.
+        With `approximate` the top books and authors come from heavy-hitters sketches.
+        """
         results = {}
+        approximation = {}
 
         if not self.borrowing_df.empty:
+            genres = self.book_attribute('genre')
+
             # Most borrowed books
-            top_books = self.borrowing_df['title'].value_counts().head(10)
-            results['top_borrowed_books'] = top_books.to_dict()
+            if approximate:
+                results['top_borrowed_books'], approximation['top_borrowed_books'] = sketch_top(
+                    values_sketch(self.book_attribute('title')), 10)
+            else:
+                top_books = _value_counts(self.book_attribute('title')).head(10)
+                results['top_borrowed_books'] = series_to_native(top_books)
 
             # Genre popularity
-            genre_popularity = self.borrowing_df['genre'].value_counts()
-            results['genre_popularity'] = genre_popularity.to_dict()
+            genre_popularity = _value_counts(genres)
+            results['genre_popularity'] = series_to_native(genre_popularity)
 
             # Average ratings by genre
-            avg_ratings = self.borrowing_df.groupby('genre')['rating'].mean().round(2)
-            results['avg_ratings_by_genre'] = avg_ratings.to_dict()
+            avg_ratings = self.borrowing_df['rating'].groupby(genres, observed=True).mean().round(2)
+            results['avg_ratings_by_genre'] = series_to_native(avg_ratings)
 
             # Completion rates by genre
-            completion_rates = self.borrowing_df.groupby('genre')['completed'].mean().round(2)
-            results['completion_rates'] = completion_rates.to_dict()
+            completion_rates = self.borrowing_df['completed'].groupby(genres, observed=True).mean().round(2)
+            results['completion_rates'] = series_to_native(completion_rates)
 
             # Top authors
-            top_authors = self.borrowing_df['author'].value_counts().head(10)
-            results['top_authors'] = top_authors.to_dict()
-
-        return self.clean_for_json(results)
-
-    def analyze_user_segments(self):
-        """Segment users based on behavior and demographics"""
+            if approximate:
+                results['top_authors'], approximation['top_authors'] = sketch_top(
+                    values_sketch(self.book_attribute('author')), 10)
+            else:
+                top_authors = _value_counts(self.book_attribute('author')).head(10)
+                results['top_authors'] = series_to_native(top_authors)
+
+        if approximate:
+            results['approximation'] = approximation
+
+        return results
+
+    def analyze_user_segments(self, approximate=False):
+        """
+        Segment users based on behavior and demographics.
+        With `approximate` the top professions come from a heavy-hitters sketch.
+        """
         results = {}
 
         # Segment by account type
-        account_distribution = self.user_df['account_type'].value_counts()
-        results['account_type_distribution'] = account_distribution.to_dict()
+        account_distribution = _value_counts(self.user_df['account_type'])
+        results['account_type_distribution'] = series_to_native(account_distribution)
 
         # Segment by age range
-        age_distribution = self.user_df['age_range'].value_counts()
-        results['age_distribution'] = age_distribution.to_dict()
+        age_distribution = _value_counts(self.user_df['age_range'])
+        results['age_distribution'] = series_to_native(age_distribution)
 
         # Segment by education
-        education_distribution = self.user_df['education_level'].value_counts()
-        results['education_distribution'] = education_distribution.to_dict()
+        education_distribution = _value_counts(self.user_df['education_level'])
+        results['education_distribution'] = series_to_native(education_distribution)
 
         # Segment by profession
-        profession_distribution = self.user_df['profession'].value_counts().head(10)
-        results['top_professions'] = profession_distribution.to_dict()
+        if approximate:
+            results['top_professions'], profession_error = sketch_top(values_sketch(self.user_df['profession']), 10)
+        else:
+            profession_distribution = _value_counts(self.user_df['profession']).head(10)
+            results['top_professions'] = series_to_native(profession_distribution)
 
         # Cross-analyze age and content preferences
         if not self.borrowing_df.empty:
-            # Merge user and borrowing data
-            user_borrow = pd.merge(self.borrowing_df, self.user_df[['user_id', 'age_range']], on='user_id')
-            genre_by_age = user_borrow.groupby(['age_range', 'genre']).size().unstack().fillna(0)
+            genre_by_age = self.genre_by_age_counts()
 
             # Convert to percentages within each age group
             genre_by_age_pct = genre_by_age.div(genre_by_age.sum(axis=1), axis=0).round(2)
-            results['genre_preferences_by_age'] = genre_by_age_pct.to_dict()
+            results['genre_preferences_by_age'] = frame_to_native(genre_by_age_pct)
+
+        if approximate:
+            results['approximation'] = {'top_professions': profession_error}
 
-        return self.clean_for_json(results)
+        return results
 
-    def analyze_search_patterns(self):
-        """Analyze user search behavior"""
+    def analyze_search_patterns(self, approximate=False, ngram=1):
+        """
+        Analyze user search behavior.
+        `ngram` sets how many consecutive words make up a search term.
+        With `approximate` the top search terms come from a heavy-hitters sketch.
+        """
         results = {}
 
         if not self.search_df.empty:
             # Extract common keywords from searches
-            all_queries = ' '.join(self.search_df['query'].tolist()).lower()
-            # Remove stopwords (simplified approach)
-            stopwords = ['the', 'a', 'an', 'and', 'in', 'on', 'at', 'for', 'to', 'of', 'with', 'by']
-            query_words = [word for word in re.findall(r'\b\w+\b', all_queries) if word not in stopwords]
-
-            word_freq = Counter(query_words).most_common(20)
-            results['top_search_terms'] = dict(word_freq)
+            if approximate:
+                results['top_search_terms'], search_error = sketch_top(search_terms_sketch(self.search_df['query'], ngram), 20)
+                results['approximation'] = {'top_search_terms': search_error}
+            else:
+                word_freq = count_search_terms(self.search_df['query'], ngram).most_common(20)
+                results['top_search_terms'] = dict(word_freq)
 
             # Search volume by hour of day
-            self.search_df['hour'] = self.search_df['timestamp'].dt.hour
-            search_by_hour = self.search_df['hour'].value_counts().sort_index()
-            results['searches_by_hour'] = search_by_hour.to_dict()
+            search_by_hour = self.derived('search_df', 'hour').value_counts().sort_index()
+            results['searches_by_hour'] = series_to_native(search_by_hour)
 
-        return self.clean_for_json(results)
+        return results
 
-    def analyze_retention(self):
-        """Analyze user retention metrics"""
+    def analyze_retention(self, as_of=None):
+        """Analyze user retention metrics, account age is measured at `as_of` (default now)"""
         results = {}
 
         # Calculate account age
-        self.user_df['registration_date_naive'] = self.user_df['registration_date'].dt.tz_localize(None)
-        self.user_df['account_age_days'] = (datetime.now() - self.user_df['registration_date_naive']).dt.days
+        # Depends on as_of, so computed per call rather than memoised
+        now = pd.Timestamp(as_of) if as_of is not None else datetime.now()
+        account_age_days = (now - self.derived('user_df', 'registration_date_naive')).dt.days
 
         # Segment by account age
-        age_bins = [0, 30, 90, 180, 365, float('inf')]
-        age_labels = ['< 1 month', '1-3 months', '3-6 months', '6-12 months', '> 1 year']
-        self.user_df['account_age_segment'] = pd.cut(self.user_df['account_age_days'],
-                                                     bins=age_bins,
-                                                     labels=age_labels)
+        account_age_segment = pd.cut(account_age_days,
+                                     bins=TENURE_BINS,
+                                     labels=TENURE_LABELS)
 
-        tenure_dist = self.user_df['account_age_segment'].value_counts()
-        results['user_tenure_distribution'] = tenure_dist.to_dict()
+        tenure_dist = account_age_segment.value_counts()
+        results['user_tenure_distribution'] = series_to_native(tenure_dist)
 
         # Activity by tenure
         if not self.session_df.empty:
             user_activity = self.session_df.groupby('user_id').size().reset_index(name='activity_count')
             user_tenure = pd.merge(user_activity,
-                                   self.user_df[['user_id', 'account_age_segment']],
+                                   pd.DataFrame({'user_id': self.user_df['user_id'],
+                                                 'account_age_segment': account_age_segment}),
                                    on='user_id')
             activity_by_tenure = user_tenure.groupby('account_age_segment', observed=False)[
                 'activity_count'].mean().round(1)
-            results['avg_activity_by_tenure'] = activity_by_tenure.to_dict()
+            results['avg_activity_by_tenure'] = series_to_native(activity_by_tenure)
 
-        return self.clean_for_json(results)
+        return results
 
-    def generate_comprehensive_report(self):
-        """Generate a comprehensive analysis report"""
+    def analyze_sections(self, sections, approximate=False, ngram=1, as_of=None):
+        """
+        Run several analysis sections on the same loaded tables.
+        `approximate` switches the sections that support it to sketch-based top-N lists,
+        `ngram` sets the search term length and `as_of` the reference time of the
+        sections that measure time until now.
+        """
+        results = {}
+        for section in sections:
+            options = {}
+            if approximate and section in APPROXIMATE_SECTIONS:
+                options['approximate'] = True
+            if section == 'search' and ngram != 1:
+                options['ngram'] = ngram
+            if as_of is not None and section in AS_OF_SECTIONS:
+                options['as_of'] = as_of
+            results[section] = getattr(self, ANALYSIS_SECTIONS[section])(**options)
+        return results
+
+    def generate_comprehensive_report(self, progress=None, processes=0):
+        """
+        Generate a comprehensive analysis report.
+        `progress(section, completed, total)` is called as sections are started (serial) or
+        finished (parallel), it may raise to stop the report.
+        With `processes` > 1 the sections run in parallel in forked worker processes.
+        Per-section wall times in seconds are kept in `section_timings`.
+        """
         report = {
             'report_date': datetime.now().strftime('%Y-%m-%d'),
-            'total_users': len(self.user_df),
-            'usage_patterns': self.analyze_usage_patterns(),
-            'content_performance': self.analyze_content_performance(),
-            'user_segments': self.analyze_user_segments(),
-            'search_patterns': self.analyze_search_patterns(),
-            'retention_metrics': self.analyze_retention()
+            'total_users': len(self.user_df)
         }
+        sections = [section for _, section in REPORT_SECTIONS]
 
-        return self.clean_for_json(report)
+        if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            results = self._run_sections_forked(sections, processes, progress)
+        else:
+            results = {}
+            for index, section in enumerate(sections):
+                if progress is not None:
+                    progress(section, index, len(sections))
+                results[section] = _timed_section(self, section)
+
+        self.section_timings = {section: results[section][1] for section in sections}
+        for key, section in REPORT_SECTIONS:
+            report[key] = results[section][0]
+
+        return report
+
+    def _run_sections_forked(self, sections, processes, progress=None):
+        """
+        Run sections in forked worker processes.
+        Workers inherit the analyzer tables copy-on-write through the fork, so the
+        DataFrames are never pickled; only the small section results come back.
+        """
+        context = multiprocessing.get_context('fork')
+        results = {}
+        with context.Pool(min(processes, len(sections)), initializer=_init_section_worker,
+                          initargs=(self,)) as pool:
+            for section, result, elapsed in pool.imap_unordered(_run_shared_section, sections):
+                results[section] = (result, elapsed)
+                if progress is not None:
+                    progress(section, len(results), len(sections))
+        return results
+
+def _timed_section(analyzer, section):
+    start = time.perf_counter()
+    result = getattr(analyzer, ANALYSIS_SECTIONS[section])()
+    return result, time.perf_counter() - start
+
+# Analyzer inherited by forked section workers
+_shared_analyzer = None
+
+def _init_section_worker(analyzer):
+    global _shared_analyzer
+    # Index locks held by other threads of the parent at fork time stay locked in the child,
+    # where no thread will ever release them; the worker gets its own unlocked ones
+    analyzer._index_locks = {}
+    analyzer._index_locks_guard = threading.Lock()
+    _shared_analyzer = analyzer
+
+def _run_shared_section(section):
+    result, elapsed = _timed_section(_shared_analyzer, section)
+    return section, result, elapsed
+
+def build_table_cache(file_path: str, reservoir=None):
+    """Parse an uploaded file once and store its flattened tables in the columnar cache"""
+    analyzer = LibraryDataAnalyzer(file_path, use_cache=False, reservoir=reservoir)
+    analyzer.save_cached_tables(file_path)
+    return analyzer
+
+def remove_table_cache(file_path: str):
+    """Remove the columnar cache of a data file"""
+    delete_table_cache(file_path)
 
 def create_data_file(db: Session, file_path: str, analyst_id: int, filename: str):
     """Store information about an uploaded data file"""
@@ -312,9 +982,16 @@ def create_data_file(db: Session, file_path: str, analyst_id: int, filename: str
     db.refresh(data_file)
     return data_file
 
-def get_data_files_by_analyst(db: Session, analyst_id: int):
-    """Get all data files uploaded by an analyst"""
-    return db.query(DataFile).filter(DataFile.analyst_id == analyst_id).all()
+def get_data_files_by_analyst(db: Session, analyst_id: int, cursor: str = None, limit: int = None):
+    """
+    Data files uploaded by an analyst, newest first: one page after `cursor` when `limit` is given.
+    Returns the files and the cursor of the next page (None on the last page).
+    """
+    query = db.query(DataFile).options(
+        load_only(DataFile.id, DataFile.filename, DataFile.upload_date)
+    ).filter(DataFile.analyst_id == analyst_id)
+    query = newest_first_page(query, DataFile.upload_date, DataFile.id, cursor, limit)
+    return split_page(query.all(), limit, 'upload_date')
 
 def save_analysis_report(db: Session, report_name: str, report_data: Dict, analyst_id: int):
     """Save analysis report to database"""
@@ -328,9 +1005,17 @@ def save_analysis_report(db: Session, report_name: str, report_data: Dict, analy
     db.refresh(report)
     return report
 
-def get_reports_by_analyst(db: Session, analyst_id: int):
-    """Get all reports created by an analyst"""
-    return db.query(AnalysisReport).filter(AnalysisReport.analyst_id == analyst_id).all()
+def get_reports_by_analyst(db: Session, analyst_id: int, cursor: str = None, limit: int = None):
+    """
+    Reports created by an analyst, newest first: one page after `cursor` when `limit` is given.
+    Only the listed columns are selected, report_data is never loaded.
+    Returns the reports and the cursor of the next page (None on the last page).
+    """
+    query = db.query(AnalysisReport).options(
+        load_only(AnalysisReport.id, AnalysisReport.report_name, AnalysisReport.created_at)
+    ).filter(AnalysisReport.analyst_id == analyst_id)
+    query = newest_first_page(query, AnalysisReport.created_at, AnalysisReport.id, cursor, limit)
+    return split_page(query.all(), limit, 'created_at')
 
 def get_report_by_id(db: Session, report_id: int):
     """Get a specific report by ID"""
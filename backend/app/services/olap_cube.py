@@ -0,0 +1,153 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+from app.services.library_analysis import clean_for_json
+from app.utils.table_cache import read_derived_table, write_derived_table
+
+# The cube holds one row per occurring (genre, age_range, account_type, month) combination of borrows
+CUBE_DIMENSIONS = ('genre', 'age_range', 'account_type', 'month')
+CUBE_MEASURES = ('borrows', 'completions', 'rating_sum', 'rating_count')
+# Dimension value of borrows whose genre, user or date is missing
+UNKNOWN = 'Unknown'
+CUBE_NAME = 'borrow_cube'
+# Bump whenever the dimensions, measures or the way they are computed change
+CUBE_VERSION = 1
+# Loaded cubes kept in memory, they are small so a count limit is enough
+CUBE_CACHE_ENTRIES = 64
+
+
+def build_cube(analyzer):
+    """Aggregate the borrows of a loaded analyzer into the cube"""
+    borrows = analyzer.borrowing_df
+    if borrows.empty:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in CUBE_DIMENSIONS} |
+                            {measure: pd.Series(dtype='float64') for measure in CUBE_MEASURES})
+
+    user_rows = analyzer.borrow_user_rows()
+
+    def user_attribute(column):
+        values = analyzer.user_df[column]
+        codes = values.cat.codes.to_numpy()[user_rows]
+        codes[user_rows < 0] = -1
+        return pd.Categorical.from_codes(codes, categories=values.cat.categories)
+
+    ratings = borrows['rating'].to_numpy(dtype='float64')
+    rated = ~np.isnan(ratings)
+    rows = pd.DataFrame({
+        'genre': analyzer.book_attribute('genre').array,
+        'age_range': user_attribute('age_range'),
+        'account_type': user_attribute('account_type'),
+        # Month buckets on the numpy side, only the aggregated months are turned into strings
+        'month': borrows['borrowed_date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]'),
+        'borrows': np.ones(len(borrows), dtype=np.int64),
+        'completions': borrows['completed'].to_numpy(dtype=np.int64),
+        'rating_sum': np.where(rated, ratings, 0.0),
+        'rating_count': rated.astype(np.int64)
+    })
+    cube = rows.groupby(list(CUBE_DIMENSIONS), observed=True, dropna=False).sum().reset_index()
+
+    months = cube['month'].to_numpy(dtype='datetime64[M]')
+    cube['month'] = [UNKNOWN if np.isnat(month) else str(month) for month in months]
+    for column in CUBE_DIMENSIONS:
+        cube[column] = cube[column].astype(object).where(cube[column].notna(), UNKNOWN)
+    return cube
+
+
+def store_cube(file_path, analyzer):
+    """Build the cube of a loaded analyzer and store it in the cache directory of its data file"""
+    cube = build_cube(analyzer)
+    write_derived_table(file_path, CUBE_NAME, cube, CUBE_VERSION)
+    return cube
+
+
+class CubeCache:
+    """Small LRU of loaded cubes keyed by (file_id, mtime, size) of the data file"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            cube = self._entries.get(key)
+            if cube is not None:
+                self._entries.move_to_end(key)
+            return cube
+
+    def put(self, key, cube):
+        with self._lock:
+            for old_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[old_key]
+            self._entries[key] = cube
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_file(self, file_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == file_id]:
+                del self._entries[key]
+
+
+cube_cache = CubeCache(CUBE_CACHE_ENTRIES)
+
+
+def get_file_cube(file_id, file_path, analyzer_loader=None):
+    """
+    Cube of a data file: from memory, else from its cache directory, else built from the
+    analyzer returned by `analyzer_loader()` and stored for next time.
+    """
+    stat = os.stat(file_path)
+    key = (file_id, stat.st_mtime_ns, stat.st_size)
+    cube = cube_cache.get(key)
+    if cube is not None:
+        return cube
+
+    cube = read_derived_table(file_path, CUBE_NAME, CUBE_VERSION)
+    if cube is None:
+        if analyzer_loader is None:
+            raise ValueError("Cube has not been built for this data file")
+        cube = build_cube(analyzer_loader())
+        try:
+            write_derived_table(file_path, CUBE_NAME, cube, CUBE_VERSION)
+        except OSError as e:
+            print(f"Could not write cube for {file_path}: {e}")
+    else:
+        # Columns come back memory-mapped, the cube is small enough to own
+        cube = cube.copy()
+
+    cube_cache.put(key, cube)
+    return cube
+
+
+def query_cube(cube, group_by=(), filters=None, month_from=None, month_to=None):
+    """
+    Roll the cube up to the `group_by` dimensions after keeping only the rows whose dimension
+    values are in `filters` (dimension -> accepted values) and whose month lies between
+    `month_from` and `month_to` (inclusive, YYYY-MM). Returns one record per group with the
+    summed measures, the completion rate and the average rating.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= cube[column].isin(values).to_numpy()
+    if month_from is not None or month_to is not None:
+        mask &= (cube['month'] != UNKNOWN).to_numpy()
+    if month_from is not None:
+        mask &= (cube['month'] >= month_from).to_numpy()
+    if month_to is not None:
+        mask &= (cube['month'] <= month_to).to_numpy()
+
+    selected = cube.loc[mask, list(group_by) + list(CUBE_MEASURES)]
+    if group_by:
+        totals = selected.groupby(list(group_by), dropna=False, sort=True)[list(CUBE_MEASURES)].sum().reset_index()
+    else:
+        totals = selected[list(CUBE_MEASURES)].sum().to_frame().T
+
+    totals['completion_rate'] = (totals['completions'] / totals['borrows'].replace(0, np.nan)).round(2)
+    totals['avg_rating'] = (totals['rating_sum'] / totals['rating_count'].replace(0, np.nan)).round(2)
+    totals = totals.astype({'borrows': 'int64', 'completions': 'int64', 'rating_count': 'int64'})
+    return clean_for_json(totals.to_dict(orient='records'))
@@ -0,0 +1,375 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from collections import Counter
+from sqlalchemy.orm import Session
+
+from app.models.library_data import AnalysisPartial
+from app.services.library_analysis import (
+    DAY_ORDER,
+    RECENCY_BINS,
+    RECENCY_LABELS,
+    TENURE_BINS,
+    TENURE_LABELS,
+    LibraryDataAnalyzer,
+    series_to_native,
+    frame_to_native,
+    count_search_terms,
+    search_terms_sketch,
+    values_sketch,
+    sketch_top,
+    first_row_indexer,
+    _value_counts
+)
+from app.utils.heavy_hitters import SpaceSavingSketch
+
+# A partial state holds the additive aggregates behind every report section of one data file:
+# plain counts, means kept as [sum, count] pairs, and per-day histograms of the login and
+# registration times from which "days since" buckets are computed at report time.
+# Reports are day-granular like the section cache: seen from a midnight `as_of`, the floored
+# day count of (as_of - time) only depends on the calendar day of the time and on whether it
+# is exactly midnight, so the histograms are keyed by the time rounded up to a whole day and
+# grow with the number of days, not users.
+# States of several files are combined with merge_partial_states and turned into the usual
+# report structure with finalize_partial_state, without reading the raw data again.
+# Activity counts merge exactly; user-level counts assume each user appears in one file.
+# Approximate states keep Space-Saving sketch states instead of the exact counters below,
+# merged with SpaceSavingSketch.merge so their memory stays fixed however many are combined.
+
+# Bump whenever the layout of a partial state or the way it is computed changes
+PARTIAL_STATE_VERSION = 3
+
+DAY_NS = 24 * 60 * 60 * 10**9
+
+# Counters that only feed top-N lists, kept as sketch states in approximate partial states
+SKETCH_COUNTERS = (('content', 'titles'), ('content', 'authors'), ('search', 'terms'))
+
+
+def _counts(series):
+    return {str(key): int(value) for key, value in series.items()}
+
+
+def _sum_count(values, keys):
+    grouped = values.groupby(keys, observed=True).agg(['sum', 'count'])
+    return {str(key): [float(row['sum']), int(row['count'])] for key, row in grouped.iterrows()}
+
+
+def _epoch_ns(times):
+    return times.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+
+def _ceil_days(times):
+    """Days since the epoch of each time rounded up: midnight keeps its own day, later times move to the next"""
+    return -(-_epoch_ns(times) // DAY_NS)
+
+
+def _day_keys(days):
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(str).tolist()
+
+
+def _day_counts(times):
+    """Rows per rounded-up day (see _ceil_days), keyed by ISO date"""
+    days, counts = np.unique(_ceil_days(times.dropna()), return_counts=True)
+    return dict(zip(_day_keys(days), counts.tolist()))
+
+
+def compute_partial_state(analyzer, approximate=False):
+    """
+    Compute the mergeable aggregates of one loaded analyzer.
+    With `approximate` the SKETCH_COUNTERS are heavy-hitters sketch states.
+    """
+    users = analyzer.user_df
+    sessions = analyzer.session_df
+    borrows = analyzer.borrowing_df
+    searches = analyzer.search_df
+
+    state = {'version': PARTIAL_STATE_VERSION, 'total_users': len(users)}
+    if approximate:
+        state['approximate'] = True
+
+    usage = {'last_login_days': _day_counts(users['last_login']) if not users.empty else {}}
+    if not sessions.empty:
+        usage['hourly'] = _counts(sessions['date'].dt.hour.value_counts(sort=False))
+        usage['weekday'] = _counts(sessions['date'].dt.day_name().value_counts(sort=False))
+        usage['device_duration'] = _sum_count(sessions['duration_minutes'], sessions['device'])
+        usage['device_pages'] = _sum_count(sessions['pages_read'], sessions['device'])
+    state['usage'] = usage
+
+    content = {}
+    if not borrows.empty:
+        genres = analyzer.book_attribute('genre')
+        if approximate:
+            content['titles'] = values_sketch(analyzer.book_attribute('title')).to_state()
+            content['authors'] = values_sketch(analyzer.book_attribute('author')).to_state()
+        else:
+            content['titles'] = _counts(_value_counts(analyzer.book_attribute('title')))
+            content['authors'] = _counts(_value_counts(analyzer.book_attribute('author')))
+        content['genres'] = _counts(_value_counts(genres))
+        content['genre_rating'] = _sum_count(borrows['rating'], genres)
+        content['genre_completed'] = _sum_count(borrows['completed'].astype(float), genres)
+    state['content'] = content
+
+    segments = {}
+    if not users.empty:
+        for column in ('account_type', 'age_range', 'education_level', 'profession'):
+            segments[column] = _counts(_value_counts(users[column]))
+    if not borrows.empty:
+        genre_by_age = analyzer.genre_by_age_counts()
+        segments['age_genre'] = {
+            str(age): {str(genre): int(count) for genre, count in row.items() if count}
+            for age, row in genre_by_age.iterrows()
+        }
+    state['segments'] = segments
+
+    search = {}
+    if not searches.empty:
+        if approximate:
+            search['terms'] = search_terms_sketch(searches['query']).to_state()
+        else:
+            search['terms'] = dict(count_search_terms(searches['query']))
+        search['hourly'] = _counts(searches['timestamp'].dt.hour.value_counts(sort=False))
+    state['search'] = search
+
+    retention = {'registration_days': _day_counts(users['registration_date']) if not users.empty else {}}
+    if not sessions.empty and not users.empty:
+        # Sessions and active users per rounded-up registration day
+        user_rows = first_row_indexer(users['user_id'], sessions['user_id'])
+        activity = np.bincount(user_rows[user_rows >= 0], minlength=len(users))
+        registered = users['registration_date'].notna().to_numpy()
+        active = (activity > 0) & registered
+        per_day = pd.DataFrame({
+            'day': _ceil_days(users['registration_date'][active]),
+            'sessions': activity[active]
+        }).groupby('day')['sessions'].agg(['sum', 'count'])
+        retention['registration_activity'] = {
+            day: [int(total), int(count)]
+            for day, total, count in zip(_day_keys(per_day.index), per_day['sum'].tolist(), per_day['count'].tolist())
+        }
+    state['retention'] = retention
+
+    return state
+
+
+def compute_file_partial_state(file_path):
+    """
+    Compute the partial state of one data file as a map step.
+    The analyzer is loaded outside the shared cache and dropped afterwards, so mapping
+    many partitions only holds one file per worker in memory.
+    """
+    return compute_partial_state(LibraryDataAnalyzer(file_path))
+
+
+def _merge_into(target, source):
+    """Add the values of one state into another: numbers add, [sum, count] pairs add element-wise"""
+    for key, value in source.items():
+        if key not in target:
+            target[key] = _copy(value)
+        elif isinstance(value, dict):
+            _merge_into(target[key], value)
+        elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(target[key], value)]
+        else:
+            target[key] = target[key] + value
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def accumulate_partial_state(merged, state):
+    """Add one partial state into a running merged state, in place"""
+    if state.get('version') != PARTIAL_STATE_VERSION:
+        raise ValueError("Partial state was computed by a different analyzer version")
+    approximate = state.get('approximate', False)
+    if merged and merged.get('approximate', False) != approximate:
+        raise ValueError("Exact and approximate partial states cannot be merged")
+
+    # Sections are copied one level deep, so taking the sketches out leaves `state` untouched
+    source = {key: dict(value) if isinstance(value, dict) else value
+              for key, value in state.items() if key not in ('version', 'approximate')}
+    sketches = {}
+    if approximate:
+        for section, name in SKETCH_COUNTERS:
+            incoming = source.get(section, {}).pop(name, None)
+            if incoming is None:
+                continue
+            sketch = SpaceSavingSketch.from_state(incoming)
+            current = merged.get(section, {}).get(name)
+            if current is not None:
+                sketch.merge(SpaceSavingSketch.from_state(current))
+            sketches[section, name] = sketch.to_state()
+
+    _merge_into(merged, source)
+    for (section, name), sketch_state in sketches.items():
+        merged.setdefault(section, {})[name] = sketch_state
+    merged['version'] = state['version']
+    if approximate:
+        merged['approximate'] = True
+    return merged
+
+
+def merge_partial_states(states):
+    """Combine the partial states of several data files into one"""
+    merged = {}
+    for state in states:
+        accumulate_partial_state(merged, state)
+    return merged
+
+
+def _sorted_counts(counts, limit=None):
+    """Counts sorted from most to least frequent, like value_counts"""
+    series = pd.Series(counts, dtype='int64')
+    series = series.sort_values(ascending=False, kind='stable')
+    return series.head(limit) if limit else series
+
+
+def _means(sum_counts, decimals=None):
+    """Means from [sum, count] pairs keyed by group, sorted by group like a groupby"""
+    means = pd.Series({key: total / count if count else np.nan
+                       for key, (total, count) in sum_counts.items()}, dtype='float64').sort_index()
+    return means.round(decimals) if decimals is not None else means
+
+
+def _days_since(day_counts, as_of):
+    """
+    Series of (whole days to the `as_of` date -> count) from a per-day histogram.
+    Counting from the rounded-up day gives exactly the floored (as_of - time).days.
+    """
+    if not day_counts:
+        return pd.Series(dtype='int64')
+    days = np.array(list(day_counts), dtype='datetime64[D]')
+    elapsed = (np.datetime64(as_of, 'D') - days).astype(np.int64)
+    return pd.Series(list(day_counts.values()), index=elapsed)
+
+
+def _bucket_counts(day_counts, as_of, bins, labels):
+    """Number of users per "days since" bucket, sorted like value_counts on the pd.cut result"""
+    per_day = _days_since(day_counts, as_of)
+    buckets = pd.cut(pd.Series(per_day.index, dtype='float64'), bins=bins, labels=labels)
+    totals = pd.Series(per_day.to_numpy()).groupby(buckets.to_numpy()).sum()
+    totals = totals.reindex(labels, fill_value=0)
+    return totals.sort_values(ascending=False, kind='stable')
+
+
+def finalize_partial_state(state, as_of=None):
+    """
+    Turn a (merged) partial state into the comprehensive report structure.
+    Reports are day-granular: `as_of` (default today) is taken at midnight of its date.
+    """
+    as_of = as_of or date.today()
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+    usage_state = state.get('usage', {})
+    content_state = state.get('content', {})
+    segment_state = state.get('segments', {})
+    search_state = state.get('search', {})
+    retention_state = state.get('retention', {})
+
+    usage = {}
+    if usage_state.get('hourly'):
+        hourly = pd.Series({int(hour): count for hour, count in usage_state['hourly'].items()}).sort_index()
+        usage['hourly_activity'] = series_to_native(hourly)
+        usage['weekly_activity'] = series_to_native(pd.Series(usage_state['weekday']).reindex(DAY_ORDER))
+        usage['avg_duration_by_device'] = series_to_native(_means(usage_state['device_duration']))
+        usage['avg_pages_by_device'] = series_to_native(_means(usage_state['device_pages']))
+    usage['login_recency'] = series_to_native(_bucket_counts(usage_state.get('last_login_days', {}), as_of,
+                                                             RECENCY_BINS, RECENCY_LABELS))
+
+    approximate = state.get('approximate', False)
+
+    content = {}
+    if content_state.get('genres'):
+        if approximate:
+            approximation = {}
+            content['top_borrowed_books'], approximation['top_borrowed_books'] = sketch_top(
+                SpaceSavingSketch.from_state(content_state['titles']), 10)
+        else:
+            content['top_borrowed_books'] = series_to_native(_sorted_counts(content_state['titles'], 10))
+        content['genre_popularity'] = series_to_native(_sorted_counts(content_state['genres']))
+        content['avg_ratings_by_genre'] = series_to_native(_means(content_state['genre_rating'], 2))
+        content['completion_rates'] = series_to_native(_means(content_state['genre_completed'], 2))
+        if approximate:
+            content['top_authors'], approximation['top_authors'] = sketch_top(
+                SpaceSavingSketch.from_state(content_state['authors']), 10)
+            content['approximation'] = approximation
+        else:
+            content['top_authors'] = series_to_native(_sorted_counts(content_state['authors'], 10))
+
+    segments = {
+        'account_type_distribution': series_to_native(_sorted_counts(segment_state.get('account_type', {}))),
+        'age_distribution': series_to_native(_sorted_counts(segment_state.get('age_range', {}))),
+        'education_distribution': series_to_native(_sorted_counts(segment_state.get('education_level', {}))),
+        'top_professions': series_to_native(_sorted_counts(segment_state.get('profession', {}), 10))
+    }
+    if segment_state.get('age_genre'):
+        genre_by_age = pd.DataFrame(segment_state['age_genre']).T.fillna(0).sort_index().sort_index(axis=1)
+        genre_by_age_pct = genre_by_age.div(genre_by_age.sum(axis=1), axis=0).round(2)
+        segments['genre_preferences_by_age'] = frame_to_native(genre_by_age_pct)
+
+    search = {}
+    if search_state.get('terms') is not None and search_state.get('hourly'):
+        if approximate:
+            search['top_search_terms'], search_error = sketch_top(SpaceSavingSketch.from_state(search_state['terms']), 20)
+            search['approximation'] = {'top_search_terms': search_error}
+        else:
+            search['top_search_terms'] = dict(Counter(search_state['terms']).most_common(20))
+        hourly = pd.Series({int(hour): count for hour, count in search_state['hourly'].items()}).sort_index()
+        search['searches_by_hour'] = series_to_native(hourly)
+
+    retention = {
+        'user_tenure_distribution': series_to_native(_bucket_counts(retention_state.get('registration_days', {}),
+                                                                    as_of, TENURE_BINS, TENURE_LABELS))
+    }
+    if 'registration_activity' in retention_state:
+        activity = retention_state['registration_activity']
+        per_day = _days_since({day: value[0] for day, value in activity.items()}, as_of)
+        users_per_day = _days_since({day: value[1] for day, value in activity.items()}, as_of)
+        buckets = pd.cut(pd.Series(per_day.index, dtype='float64'), bins=TENURE_BINS, labels=TENURE_LABELS)
+        sessions = pd.Series(per_day.to_numpy()).groupby(buckets.to_numpy()).sum()
+        active_users = pd.Series(users_per_day.to_numpy()).groupby(buckets.to_numpy()).sum()
+        activity_by_tenure = (sessions / active_users.replace(0, np.nan)).reindex(TENURE_LABELS).round(1)
+        retention['avg_activity_by_tenure'] = series_to_native(activity_by_tenure)
+
+    report = {
+        'report_date': as_of.strftime('%Y-%m-%d'),
+        'total_users': state.get('total_users', 0),
+        'usage_patterns': usage,
+        'content_performance': content,
+        'user_segments': segments,
+        'search_patterns': search,
+        'retention_metrics': retention
+    }
+    return report
+
+
+def combine_partial_states(states, as_of=None):
+    """Merge the partial states of several data files and build one report from them"""
+    return finalize_partial_state(merge_partial_states(states), as_of)
+
+
+def get_partial_state(db: Session, data_file_id: int):
+    """Get the stored partial state of a data file for the current state version"""
+    partial = db.query(AnalysisPartial).filter(
+        AnalysisPartial.data_file_id == data_file_id,
+        AnalysisPartial.version == PARTIAL_STATE_VERSION
+    ).first()
+    return partial.state if partial else None
+
+
+def save_partial_state(db: Session, data_file_id: int, state):
+    """Store the partial state of a data file, replacing older versions"""
+    db.query(AnalysisPartial).filter(
+        AnalysisPartial.data_file_id == data_file_id
+    ).delete(synchronize_session=False)
+    partial = AnalysisPartial(
+        data_file_id=data_file_id,
+        version=PARTIAL_STATE_VERSION,
+        state=state
+    )
+    db.add(partial)
+    db.commit()
+    return partial
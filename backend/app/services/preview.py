@@ -0,0 +1,199 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from dotenv import load_dotenv
+
+from app.services.library_analysis import (
+    LibraryDataAnalyzer,
+    TABLE_NAMES,
+    REPORT_SECTIONS,
+    build_table_cache
+)
+from app.utils.reservoir import UserReservoir
+from app.utils.table_cache import read_derived_table, write_derived_table
+
+load_dotenv()
+
+# Users kept in the reservoir sample taken while a file is ingested, the largest preview possible
+PREVIEW_SAMPLE_SIZE = int(os.getenv("PREVIEW_SAMPLE_SIZE", "10000"))
+PREVIEW_DEFAULT_GROUPS = 10
+# Bump whenever the layout of the stored sample changes
+PREVIEW_VERSION = 1
+
+# Results that count users or events, they are scaled up from the sample to the whole file
+COUNT_RESULTS = {
+    'hourly_activity', 'weekly_activity', 'login_recency',
+    'top_borrowed_books', 'genre_popularity', 'top_authors',
+    'account_type_distribution', 'age_distribution', 'education_distribution', 'top_professions',
+    'top_search_terms', 'searches_by_hour',
+    'user_tenure_distribution'
+}
+# Top-N lists are cut per group, so a group missing an item says nothing about its count
+TOP_RESULTS = {'top_borrowed_books', 'top_authors', 'top_professions', 'top_search_terms'}
+
+# Two-sided 95% Student t quantiles by degrees of freedom
+_T_975 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+    10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+    18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+    26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042
+}
+
+
+def _derived_name(table_name):
+    return f"preview_{table_name}"
+
+
+def save_preview_sample(file_path, analyzer, positions):
+    """Store the sampled users (in reservoir key order) and their activity next to the file cache"""
+    sample = analyzer.select_users(np.asarray(positions, dtype=np.int64), keep_row_order=False)
+    for name in TABLE_NAMES:
+        write_derived_table(file_path, _derived_name(name), getattr(sample, name), PREVIEW_VERSION)
+    meta = pd.DataFrame({'population_users': [len(analyzer.user_df)]})
+    write_derived_table(file_path, _derived_name('meta'), meta, PREVIEW_VERSION)
+
+
+def build_ingestion_caches(file_path):
+    """
+    Build the table cache of an uploaded file, taking the preview sample during the same pass.
+    Returns the loaded analyzer.
+    """
+    reservoir = UserReservoir(PREVIEW_SAMPLE_SIZE)
+    analyzer = build_table_cache(file_path, reservoir)
+    save_preview_sample(file_path, analyzer, reservoir.positions())
+    return analyzer
+
+
+def load_preview_sample(file_path):
+    """The stored sample as an analyzer plus the number of users in the whole file, or None"""
+    meta = read_derived_table(file_path, _derived_name('meta'), PREVIEW_VERSION)
+    if meta is None:
+        return None
+    sample = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+    for name in TABLE_NAMES:
+        table = read_derived_table(file_path, _derived_name(name), PREVIEW_VERSION)
+        if table is None:
+            return None
+        setattr(sample, name, table)
+    return sample, int(meta['population_users'].iloc[0])
+
+
+def get_preview_sample(file_path, analyzer_loader):
+    """
+    Stored sample of a data file; files ingested before samples existed (or whose cache was
+    rebuilt) are sampled from the analyzer returned by `analyzer_loader()` and stored.
+    """
+    stored = load_preview_sample(file_path)
+    if stored is not None:
+        return stored
+
+    analyzer = analyzer_loader()
+    reservoir = UserReservoir(PREVIEW_SAMPLE_SIZE)
+    for _ in reservoir.observe(range(len(analyzer.user_df))):
+        pass
+    try:
+        save_preview_sample(file_path, analyzer, reservoir.positions())
+    except OSError as e:
+        print(f"Could not write preview sample for {file_path}: {e}")
+    sample = analyzer.select_users(np.asarray(reservoir.positions(), dtype=np.int64), keep_row_order=False)
+    return sample, len(analyzer.user_df)
+
+
+def _scaled(results, factor):
+    """Report sections with count results scaled from the sample up to the whole file"""
+    scaled = {}
+    for key, section in results.items():
+        scaled[key] = {
+            name: _scale_value(value, factor) if name in COUNT_RESULTS else value
+            for name, value in section.items()
+        }
+    return scaled
+
+
+def _scale_value(value, factor):
+    if isinstance(value, dict):
+        return {key: _scale_value(item, factor) for key, item in value.items()}
+    return int(round(value * factor))
+
+
+def _interval(estimate, values, is_count):
+    """Random-groups interval around the full-sample estimate, None with fewer than two groups"""
+    if len(values) < 2:
+        return None
+    standard_error = float(np.std(values, ddof=1)) / math.sqrt(len(values))
+    half_width = _T_975.get(len(values) - 1, 1.96) * standard_error
+    if is_count:
+        return [max(0, int(round(estimate - half_width))), int(round(estimate + half_width))]
+    return [round(estimate - half_width, 2), round(estimate + half_width, 2)]
+
+
+def _intervals(estimate, groups, name):
+    """Intervals with the nesting of `estimate`, from the same entry in each group result"""
+    if isinstance(estimate, dict):
+        return {
+            key: _intervals(value, [group.get(key) if isinstance(group, dict) else None for group in groups], name)
+            for key, value in estimate.items()
+        }
+    if name in TOP_RESULTS:
+        values = [value for value in groups if value is not None]
+    elif name in COUNT_RESULTS:
+        values = [0 if value is None else value for value in groups]
+    else:
+        values = [value for value in groups if value is not None]
+    return _interval(estimate, values, name in COUNT_RESULTS)
+
+
+def _run_report_sections(analyzer, as_of):
+    sections = [section for _, section in REPORT_SECTIONS]
+    results = analyzer.analyze_sections(sections, as_of=as_of)
+    return {key: results[section] for key, section in REPORT_SECTIONS}
+
+
+def preview_report(sample, population_users, count=None, fraction=None, groups=PREVIEW_DEFAULT_GROUPS, as_of=None):
+    """
+    Comprehensive report estimated from the first `count` (or `fraction` of all) sampled users.
+    The sample is split into `groups` random groups that are analysed on their own; the spread
+    of the group estimates gives 95% intervals around the estimate of the whole sample
+    (random groups method). Counts are scaled up to the whole file, rates and means are not.
+    """
+    if fraction is not None:
+        count = math.ceil(fraction * population_users)
+    available = len(sample.user_df)
+    count = available if count is None else min(count, available)
+
+    # The sample is in random key order, so the first rows and contiguous blocks are random groups too
+    preview = sample.select_users(np.arange(count), keep_row_order=False)
+    estimate = _scaled(_run_report_sections(preview, as_of), population_users / count if count else 0)
+
+    group_results = []
+    for block in np.array_split(np.arange(count), min(groups, count)) if count else []:
+        group = preview.select_users(block, keep_row_order=False)
+        group_results.append(_scaled(_run_report_sections(group, as_of), population_users / len(block)))
+
+    intervals = {
+        key: {
+            name: _intervals(value, [group[key].get(name) for group in group_results], name)
+            for name, value in section.items()
+        }
+        for key, section in estimate.items()
+    }
+
+    report = {
+        'report_date': (as_of or datetime.now()).strftime('%Y-%m-%d'),
+        'total_users': population_users
+    }
+    report.update(estimate)
+    return {
+        'approximate': True,
+        'sample': {
+            'users': count,
+            'population_users': population_users,
+            'fraction': round(count / population_users, 4) if population_users else 0,
+            'groups': len(group_results),
+            'confidence': 0.95
+        },
+        'report': report,
+        'confidence_intervals': intervals
+    }
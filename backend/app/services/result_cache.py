@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+import threading
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.library_data import SectionResult
+from app.services.library_analysis import ANALYZER_VERSION, AS_OF_SECTIONS, APPROXIMATE_SECTIONS
+from app.utils.datetime_parsing import to_naive_utc
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Content hashes of data files, keyed by (path, mtime, size) so a replaced file is hashed again
+_content_hashes = {}
+_content_hashes_lock = threading.Lock()
+
+
+def file_content_hash(file_path):
+    """SHA-256 of a data file, computed once per version of the file"""
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    with _content_hashes_lock:
+        content_hash = _content_hashes.get(key)
+    if content_hash is not None:
+        return content_hash
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    with _content_hashes_lock:
+        for old_key in [k for k in _content_hashes if k[0] == file_path]:
+            del _content_hashes[old_key]
+        _content_hashes[key] = content_hash
+    return content_hash
+
+
+def section_params(section, approximate=False, ngram=1, start=None, end=None, segment=None):
+    """The options that change the result of a section, in a stable JSON-friendly form"""
+    params = {}
+    if approximate and section in APPROXIMATE_SECTIONS:
+        params['approximate'] = True
+    if ngram != 1 and section == 'search':
+        params['ngram'] = ngram
+    if start is not None:
+        params['start'] = to_naive_utc(start).isoformat()
+    if end is not None:
+        params['end'] = to_naive_utc(end).isoformat()
+    if segment:
+        params['segment'] = {column: sorted(set(values)) for column, values in sorted(segment.items())}
+    return params
+
+
+def _params_hash(params):
+    encoded = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def section_as_of(section, as_of):
+    """Key part for the reference date, only time-dependent sections are keyed by it"""
+    return as_of.isoformat() if section in AS_OF_SECTIONS else ""
+
+
+def get_section_result(db: Session, content_hash: str, section: str, params, as_of: str):
+    """Stored result of a section for the current analyzer version, or None"""
+    row = db.query(SectionResult).filter(
+        SectionResult.content_hash == content_hash,
+        SectionResult.section == section,
+        SectionResult.params_hash == _params_hash(params),
+        SectionResult.analyzer_version == ANALYZER_VERSION,
+        SectionResult.as_of == as_of
+    ).first()
+    return row.result if row else None
+
+
+def save_section_result(db: Session, data_file_id: int, content_hash: str, section: str, params, as_of: str, result):
+    """Store a computed section result; a concurrent request storing the same key first wins"""
+    row = SectionResult(
+        data_file_id=data_file_id,
+        content_hash=content_hash,
+        section=section,
+        params_hash=_params_hash(params),
+        params=params,
+        analyzer_version=ANALYZER_VERSION,
+        as_of=as_of,
+        result=result
+    )
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+
+
+def delete_section_results(db: Session, data_file_id: int):
+    """Drop the cached results of a data file"""
+    db.query(SectionResult).filter(
+        SectionResult.data_file_id == data_file_id
+    ).delete(synchronize_session=False)
+
+
+def purge_stale_section_results():
+    """Drop cached results computed by other analyzer versions"""
+    db = SessionLocal()
+    try:
+        deleted = db.query(SectionResult).filter(
+            SectionResult.analyzer_version != ANALYZER_VERSION
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
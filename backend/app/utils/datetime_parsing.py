@@ -0,0 +1,95 @@
+import re
+import numpy as np
+import pandas as pd
+
+# ISO-8601 layout used by the library exports, e.g. 2025-03-14T09:26:53Z or 2025-03-14T09:26:53.120+02:00
+_ISO_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d{1,9})?(Z|[+-]\d{2}:?\d{2})?$')
+
+# Thresholds on the magnitude of an epoch value used to guess its unit
+_EPOCH_UNITS = ((1e17, 'ns'), (1e14, 'us'), (1e11, 'ms'), (0, 's'))
+
+
+def _offset_minutes(suffix):
+    if suffix in ('', 'Z'):
+        return 0
+    sign = -1 if suffix[0] == '-' else 1
+    digits = suffix[1:].replace(':', '')
+    return sign * (int(digits[:2]) * 60 + int(digits[2:]))
+
+
+def _parse_fixed_iso(values, sample, suffix):
+    """
+    Vectorized parse of strings sharing the layout (length and UTC offset) of `sample`.
+    The strings are copied into a fixed-width unicode array, the offset suffix is checked on the
+    raw code points and the local part is parsed by numpy in C. Returns None if any value
+    does not share the layout.
+    """
+    width = len(sample)
+    local_width = width - len(suffix)
+
+    # One extra character so that longer values are detected instead of silently truncated
+    fixed = values.astype(f'U{width + 1}')
+    code_points = fixed.view(np.uint32).reshape(len(fixed), width + 1)
+    tail = code_points[:, local_width:]
+    if not (tail == tail[0]).all():
+        return None
+
+    try:
+        parsed = fixed.astype(f'U{local_width}').astype('datetime64[ns]')
+    except ValueError:
+        return None
+
+    offset = _offset_minutes(suffix)
+    if offset:
+        parsed = parsed - np.timedelta64(offset, 'm')
+    return parsed
+
+
+def parse_datetime_column(series):
+    """
+    Convert a column of timestamps to naive UTC datetime64[ns].
+    The format is detected once per column from the first non-null value:
+    epoch numbers are converted directly, ISO-8601 strings with one fixed layout take a
+    vectorized numpy path, and anything else falls back to pandas with an explicit format
+    and a parse cache for repeated values.
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert('UTC').dt.tz_localize(None)
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        return series
+
+    mask = series.notna().to_numpy()
+    if not mask.any():
+        return pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    values = series.to_numpy()[mask]
+    sample = values[0]
+
+    if pd.api.types.is_numeric_dtype(series.dtype) or isinstance(sample, (int, float, np.number)):
+        numbers = pd.to_numeric(series)
+        magnitude = np.abs(numbers.to_numpy()[mask]).max()
+        unit = next(unit for threshold, unit in _EPOCH_UNITS if magnitude >= threshold)
+        return pd.to_datetime(numbers, unit=unit)
+
+    match = _ISO_PATTERN.match(sample) if isinstance(sample, str) else None
+    if match is None:
+        return pd.to_datetime(series, utc=True, cache=True).dt.tz_localize(None)
+
+    parsed = _parse_fixed_iso(values, sample, match.group(1) or '')
+    if parsed is None:
+        return pd.to_datetime(series, format='ISO8601', utc=True, cache=True).dt.tz_localize(None)
+
+    if mask.all():
+        return pd.Series(parsed, index=series.index)
+    result = np.full(len(series), np.datetime64('NaT'), dtype='datetime64[ns]')
+    result[mask] = parsed
+    return pd.Series(result, index=series.index)
+
+
+def to_naive_utc(value):
+    """Convert a datetime (aware or naive UTC) to a naive UTC Timestamp, None stays None"""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    if value.tzinfo is not None:
+        value = value.tz_convert('UTC').tz_localize(None)
+    return value
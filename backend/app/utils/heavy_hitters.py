@@ -0,0 +1,101 @@
+import heapq
+import numpy as np
+import pandas as pd
+
+# Rows counted exactly at a time before being folded into a sketch
+CHUNK_SIZE = 100_000
+
+
+class SpaceSavingSketch:
+    """
+    Space-Saving heavy-hitters summary holding at most `capacity` counters.
+
+    Every kept item has an estimated count and an error, with
+    estimate - error <= true count <= estimate, and no error is larger than total / capacity.
+    Any item whose true count exceeds total / capacity is guaranteed to be kept.
+    Sketches built over different partitions are combined with `merge`, which keeps the
+    same guarantees for the combined stream (mergeable Space-Saving).
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Sketch capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+
+    def _floor(self):
+        """Largest count an item missing from the sketch can have"""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def _combine(self, counts, errors, floor, total):
+        own_floor = self._floor()
+        merged_counts = {}
+        merged_errors = {}
+        for key in self.counts.keys() | counts.keys():
+            merged_counts[key] = self.counts.get(key, own_floor) + counts.get(key, floor)
+            merged_errors[key] = self.errors.get(key, own_floor) + errors.get(key, floor)
+
+        if len(merged_counts) > self.capacity:
+            kept = heapq.nlargest(self.capacity, merged_counts, key=merged_counts.get)
+            merged_counts = {key: merged_counts[key] for key in kept}
+            merged_errors = {key: merged_errors[key] for key in kept}
+
+        self.counts = merged_counts
+        self.errors = merged_errors
+        self.total += total
+
+    def update_counts(self, counts):
+        """Add exact counts (item -> count) of a chunk of the stream"""
+        counts = {key: int(value) for key, value in counts.items() if value}
+        self._combine(counts, {}, 0, sum(counts.values()))
+
+    def update(self, values, chunk_size=CHUNK_SIZE):
+        """Add the items of a Series chunk by chunk, categoricals are counted on their codes"""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories
+            for start in range(0, len(codes), chunk_size):
+                chunk = codes[start:start + chunk_size]
+                uniques, counts = np.unique(chunk[chunk >= 0], return_counts=True)
+                self.update_counts(dict(zip(categories[uniques], counts)))
+        else:
+            for start in range(0, len(values), chunk_size):
+                self.update_counts(values.iloc[start:start + chunk_size].value_counts().to_dict())
+
+    def merge(self, other):
+        """Fold another sketch, e.g. of a different partition, into this one"""
+        self._combine(other.counts, other.errors, other._floor(), other.total)
+        return self
+
+    def top(self, n):
+        """The n items with the largest estimated counts as (item, estimate) pairs"""
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+    def max_error(self, items=None):
+        """Largest overestimate among `items` (all kept items by default)"""
+        keys = self.counts if items is None else items
+        return max((self.errors[key] for key in keys), default=0)
+
+    def error_bound(self):
+        """Worst-case overestimate of any count: total / capacity"""
+        return self.total / self.capacity
+
+    def to_state(self):
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'counts': [[key, count, self.errors[key]] for key, count in self.counts.items()]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['capacity'])
+        sketch.total = state['total']
+        for key, count, error in state['counts']:
+            sketch.counts[key] = count
+            sketch.errors[key] = error
+        return sketch
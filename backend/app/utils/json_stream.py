@@ -0,0 +1,106 @@
+import json
+
+CHUNK_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+
+class _StreamReader:
+    """Buffered text reader that decodes one JSON value at a time"""
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # Characters of JSON text behind the last decoded value
+        self.last_size = 0
+
+    def _fill(self):
+        """Read the next chunk, dropping the part of the buffer already consumed"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value from the stream"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut at the buffer edge ("3." or "12") may continue in the next chunk
+            truncated = end == len(self.buffer) or self.buffer[end] not in _DELIMITERS
+            if truncated and not self.eof and self._fill():
+                continue
+            self.last_size = end - self.pos
+            self.pos = end
+            return value
+
+
+def iter_json_array(file_path, key, chunk_size=CHUNK_SIZE, with_sizes=False):
+    """
+    Yield the items of the array stored under `key` in a top-level JSON object,
+    one at a time, without loading the whole document into memory.
+    With `with_sizes`, (item, characters of its JSON text) pairs are yielded instead.
+    Other top-level keys are decoded and discarded.
+    Raises KeyError if the document has no such key.
+    """
+    found = False
+    with open(file_path, 'r') as file:
+        reader = _StreamReader(file, chunk_size)
+        reader.expect('{')
+        while reader.peek() != '}':
+            name = reader.value()
+            reader.expect(':')
+            if name == key:
+                found = True
+                reader.expect('[')
+                if reader.peek() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        item = reader.value()
+                        yield (item, reader.last_size) if with_sizes else item
+                        if reader.peek() == ',':
+                            reader.pos += 1
+                            continue
+                        reader.expect(']')
+                        break
+            else:
+                reader.value()
+
+            if reader.peek() != ',':
+                break
+            reader.pos += 1
+        reader.expect('}')
+
+    if not found:
+        raise KeyError(key)
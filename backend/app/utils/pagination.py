@@ -0,0 +1,51 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# Largest page a list endpoint returns
+LIST_PAGE_MAX = 100
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past a row in newest-first order"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) of a cursor, raises ValueError when it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def newest_first_page(query, created_column, id_column, cursor=None, limit=None):
+    """
+    Keyset pagination of a Query or select(), newest rows first with the id as tie-breaker.
+    Rows after `cursor` are selected through the (owner, created) index instead of an OFFSET scan;
+    one row more than `limit` is fetched to tell whether another page follows.
+    """
+    if cursor is not None:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    query = query.order_by(created_column.desc(), id_column.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+def split_page(rows, limit, created_attribute):
+    """Rows of the page and the cursor of the next one (None on the last page)"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_attribute), last.id)
@@ -0,0 +1,35 @@
+import heapq
+import random
+
+
+class UserReservoir:
+    """
+    Bottom-k reservoir sample of stream positions.
+    Every item gets a uniform random key and the `size` smallest keys are kept, so the sample
+    is uniform and any prefix of `positions()` is itself a uniform sample of that size.
+    """
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.seen = 0
+        self._random = random.Random(seed)
+        # Max-heap on the key through negation, the root is the first key to be replaced
+        self._heap = []
+
+    def offer(self, position):
+        key = self._random.random()
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, (-key, position))
+        elif key < -self._heap[0][0]:
+            heapq.heapreplace(self._heap, (-key, position))
+        self.seen += 1
+
+    def observe(self, items):
+        """Pass the items of a stream through, offering the position of each one"""
+        for item in items:
+            self.offer(self.seen)
+            yield item
+
+    def positions(self):
+        """Sampled positions in increasing key order"""
+        return [position for _, position in sorted(self._heap, reverse=True)]
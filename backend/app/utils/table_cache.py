@@ -0,0 +1,178 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Bump whenever the on-disk layout or the flattened table schema changes
+CACHE_FORMAT_VERSION = 3
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_cache_dir(file_path):
+    """Cache directory stored next to the uploaded file"""
+    return f"{file_path}.cache"
+
+
+def _source_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_manifest(file_path):
+    """Return the cache manifest, or None if the cache is missing or stale"""
+    manifest_path = os.path.join(get_cache_dir(file_path), MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != CACHE_FORMAT_VERSION:
+        return None
+    try:
+        if manifest.get('source') != _source_signature(file_path):
+            return None
+    except OSError:
+        return None
+    return manifest
+
+
+def is_cache_fresh(file_path):
+    return _read_manifest(file_path) is not None
+
+
+def _write_column(table_dir, column, series):
+    """
+    Store one column as .npy files.
+    Numeric, boolean and datetime columns are saved as-is so they can be memory-mapped;
+    categorical and string columns are stored as int32 codes plus a fixed-width unicode array
+    of categories (strings are dictionary-encoded on write and decoded back on read).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        np.save(os.path.join(table_dir, f"{column}.codes.npy"), series.cat.codes.to_numpy().astype(np.int32))
+        np.save(os.path.join(table_dir, f"{column}.values.npy"), np.asarray(series.cat.categories, dtype=str))
+        return 'category'
+
+    if series.dtype == object:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        np.save(os.path.join(table_dir, f"{column}.codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(table_dir, f"{column}.values.npy"), np.asarray(uniques, dtype=str))
+        return 'strings'
+
+    np.save(os.path.join(table_dir, f"{column}.npy"), series.to_numpy())
+    return 'array'
+
+
+def write_table_cache(file_path, tables):
+    """
+    Write the flattened tables (name -> DataFrame) of a data file to its cache directory.
+    The cache is written to a temporary directory first and swapped in, so readers
+    never see a half-written cache.
+    """
+    cache_dir = get_cache_dir(file_path)
+    tmp_dir = f"{cache_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {
+        'version': CACHE_FORMAT_VERSION,
+        'source': _source_signature(file_path),
+        'tables': {}
+    }
+    for name, df in tables.items():
+        table_dir = os.path.join(tmp_dir, name)
+        os.makedirs(table_dir)
+        columns = {}
+        for column in df.columns:
+            columns[column] = _write_column(table_dir, column, df[column])
+        manifest['tables'][name] = {'rows': len(df), 'columns': columns}
+
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def _read_column(table_dir, column, kind):
+    if kind == 'category':
+        codes = np.load(os.path.join(table_dir, f"{column}.codes.npy"))
+        values = np.load(os.path.join(table_dir, f"{column}.values.npy")).astype(object)
+        return pd.Categorical.from_codes(codes, categories=values)
+    if kind == 'strings':
+        codes = np.load(os.path.join(table_dir, f"{column}.codes.npy"))
+        values = np.load(os.path.join(table_dir, f"{column}.values.npy")).astype(object)
+        column_values = values.take(codes, mode='clip') if len(values) else np.full(len(codes), None, dtype=object)
+        column_values[codes < 0] = None
+        return column_values
+    return np.load(os.path.join(table_dir, f"{column}.npy"), mmap_mode='r')
+
+
+def read_table_cache(file_path, columns=None):
+    """
+    Load cached tables for a data file.
+    `columns` optionally maps table name -> list of columns to load; tables not listed are skipped.
+    Returns a dict of DataFrames, or None when the cache is missing or stale.
+    """
+    manifest = _read_manifest(file_path)
+    if manifest is None:
+        return None
+
+    cache_dir = get_cache_dir(file_path)
+    tables = {}
+    for name, table in manifest['tables'].items():
+        if columns is not None and name not in columns:
+            continue
+        wanted = table['columns'] if columns is None else [c for c in columns[name] if c in table['columns']]
+        table_dir = os.path.join(cache_dir, name)
+        data = {column: _read_column(table_dir, column, table['columns'][column]) for column in wanted}
+        tables[name] = pd.DataFrame(data, index=pd.RangeIndex(table['rows'])) if data else pd.DataFrame()
+    return tables
+
+
+def _derived_dir(file_path, name):
+    return os.path.join(get_cache_dir(file_path), 'derived', name)
+
+
+def write_derived_table(file_path, name, df, version):
+    """
+    Store a table derived from a data file (e.g. a pre-aggregated cube) in its cache directory.
+    `version` is the format version of the derived table, it is checked on read.
+    """
+    table_dir = _derived_dir(file_path, name)
+    tmp_dir = f"{table_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = {column: _write_column(tmp_dir, column, df[column]) for column in df.columns}
+    manifest = {
+        'version': version,
+        'source': _source_signature(file_path),
+        'rows': len(df),
+        'columns': columns
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file)
+
+    shutil.rmtree(table_dir, ignore_errors=True)
+    os.replace(tmp_dir, table_dir)
+
+
+def read_derived_table(file_path, name, version):
+    """Load a derived table, or None when it is missing, stale or of another version"""
+    table_dir = _derived_dir(file_path, name)
+    try:
+        with open(os.path.join(table_dir, MANIFEST_NAME), 'r') as file:
+            manifest = json.load(file)
+        if manifest.get('version') != version or manifest.get('source') != _source_signature(file_path):
+            return None
+        data = {column: _read_column(table_dir, column, kind) for column, kind in manifest['columns'].items()}
+    except (OSError, ValueError):
+        return None
+    return pd.DataFrame(data, index=pd.RangeIndex(manifest['rows']))
+
+
+def delete_table_cache(file_path):
+    shutil.rmtree(get_cache_dir(file_path), ignore_errors=True)
@@ -0,0 +1,159 @@
+"""
+Benchmark of the table flattening step of LibraryDataAnalyzer.
+
+Compares the previous implementation (four passes over the users, one dict per row,
+pd.DataFrame from records) with the single-pass column-buffer engine in flatten_users.
+
+Usage (from the backend directory, with DATABASE_URL set as for the app):
+    python -m benchmarks.flatten_benchmark [number_of_users ...]
+
+Defaults to 100000 and 1000000 users. Synthetic users are built from a pool of
+templates so the input itself takes little memory and generation is not timed.
+"""
+import gc
+import sys
+import time
+import random
+import pandas as pd
+
+from app.services.library_analysis import flatten_users
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+TEMPLATE_COUNT = 1000
+
+
+def make_template_users(count=TEMPLATE_COUNT, seed=42):
+    rng = random.Random(seed)
+    genres = ['Fiction', 'Science', 'History', 'Fantasy', 'Romance', 'Mystery']
+    devices = ['mobile', 'tablet', 'desktop', 'e-reader']
+    users = []
+    for i in range(count):
+        books = [
+            {
+                'book_id': f"B{rng.randint(0, 5000)}",
+                'title': f"Title {rng.randint(0, 5000)}",
+                'author': f"Author {rng.randint(0, 800)}",
+                'genre': rng.choice(genres),
+                'borrowed_date': '2025-01-15T10:30:00Z',
+                'return_date': '2025-01-29T10:30:00Z' if rng.random() < 0.7 else None,
+                'rating': rng.randint(1, 5) if rng.random() < 0.6 else None,
+                'completed': rng.random() < 0.5
+            }
+            for _ in range(rng.randint(0, 3))
+        ]
+        sessions = [
+            {
+                'book_id': f"B{rng.randint(0, 5000)}",
+                'date': '2025-02-01T20:15:00Z',
+                'duration_minutes': rng.randint(5, 120),
+                'pages_read': rng.randint(1, 80),
+                'device': rng.choice(devices)
+            }
+            for _ in range(rng.randint(0, 4))
+        ]
+        searches = [
+            {'timestamp': '2025-02-02T08:00:00Z', 'query': 'science fiction classics'}
+            for _ in range(rng.randint(0, 2))
+        ]
+        users.append({
+            'user_id': f"U{i}",
+            'account': {
+                'registration_date': '2024-03-10T12:00:00Z',
+                'account_type': rng.choice(['free', 'premium', 'student']),
+                'subscription_status': 'active',
+                'login_frequency': 'weekly',
+                'last_login': '2025-04-20T18:45:00Z'
+            },
+            'profile': {
+                'age_range': rng.choice(['18-24', '25-34', '35-44', '45-54', '55+']),
+                'education_level': rng.choice(['Bachelor', 'Master', 'PhD']),
+                'profession': rng.choice(['Engineer', 'Teacher', 'Student', 'Doctor'])
+            },
+            'activity': {
+                'books_borrowed': books,
+                'reading_sessions': sessions,
+                'search_history': searches
+            }
+        })
+    return users
+
+
+def legacy_flatten(users):
+    """The row-dict implementation used before flatten_users"""
+    user_df = pd.DataFrame([{
+        'user_id': user['user_id'],
+        'registration_date': user['account']['registration_date'],
+        'account_type': user['account']['account_type'],
+        'subscription_status': user['account']['subscription_status'],
+        'login_frequency': user['account']['login_frequency'],
+        'last_login': user['account']['last_login'],
+        'age_range': user['profile']['age_range'],
+        'education_level': user['profile']['education_level'],
+        'profession': user['profile']['profession']
+    } for user in users])
+
+    borrowing_data = []
+    for user in users:
+        for book in user['activity'].get('books_borrowed', []):
+            borrowing_data.append({
+                'user_id': user['user_id'],
+                'book_id': book['book_id'],
+                'title': book['title'],
+                'author': book['author'],
+                'genre': book['genre'],
+                'borrowed_date': book['borrowed_date'],
+                'return_date': book.get('return_date'),
+                'rating': book.get('rating'),
+                'completed': book.get('completed', False)
+            })
+    borrowing_df = pd.DataFrame(borrowing_data)
+
+    session_data = []
+    for user in users:
+        for session in user['activity'].get('reading_sessions', []):
+            session_data.append({
+                'user_id': user['user_id'],
+                'book_id': session['book_id'],
+                'date': session['date'],
+                'duration_minutes': session['duration_minutes'],
+                'pages_read': session['pages_read'],
+                'device': session['device']
+            })
+    session_df = pd.DataFrame(session_data)
+
+    search_data = []
+    for user in users:
+        for search in user['activity'].get('search_history', []):
+            search_data.append({
+                'user_id': user['user_id'],
+                'timestamp': search['timestamp'],
+                'query': search['query']
+            })
+    search_df = pd.DataFrame(search_data)
+
+    return user_df, borrowing_df, session_df, search_df
+
+
+def time_it(func, users):
+    gc.collect()
+    start = time.perf_counter()
+    tables = func(users)
+    elapsed = time.perf_counter() - start
+    rows = sum(len(table) for table in tables)
+    del tables
+    return elapsed, rows
+
+
+def main(sizes):
+    templates = make_template_users()
+    print(f"{'users':>10} {'rows':>10} {'legacy, s':>10} {'single-pass, s':>15} {'speedup':>8}")
+    for size in sizes:
+        users = [templates[i % len(templates)] for i in range(size)]
+        legacy_time, rows = time_it(legacy_flatten, users)
+        new_time, _ = time_it(flatten_users, users)
+        print(f"{size:>10} {rows:>10} {legacy_time:>10.2f} {new_time:>15.2f} {legacy_time / new_time:>7.2f}x")
+        del users
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
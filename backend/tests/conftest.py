@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+# The analysis modules import the models, which need a database URL at import time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GENRES = ['Fiction', 'Science', 'History', 'Fantasy', 'Romance', 'Mystery']
+DEVICES = ['mobile', 'tablet', 'desktop']
+AGE_RANGES = ['18-24', '25-34', '35-44', '45-54', '55+']
+EDUCATION_LEVELS = ['High School', 'Bachelor', 'Master', 'PhD']
+PROFESSIONS = ['Engineer', 'Teacher', 'Student', 'Doctor', 'Artist', 'Nurse']
+# Few books, authors and search words, so no top-N list is cut between tied entries
+BOOKS = [(f'B{i:03d}', f'Title {i}', f'Author {i % 4}', GENRES[i % 6]) for i in range(8)]
+QUERIES = ['history of rome', 'science fiction', 'best fantasy', 'mystery and crime']
+BASE_TIME = datetime(2025, 12, 31, 18, 0, 0)
+
+
+def _timestamp(rng, max_days):
+    """
+    Random time before BASE_TIME, with a time of day so day flooring matters;
+    some times fall exactly at midnight, which floors differently
+    """
+    moment = BASE_TIME - timedelta(days=rng.randint(0, max_days), seconds=rng.randint(0, 86399))
+    if rng.random() < 0.1:
+        moment = moment.replace(hour=0, minute=0, second=0)
+    return moment.isoformat() + 'Z'
+
+
+def make_library_data(users, seed=0, first_user=0, duplicate_ids=0):
+    """
+    Library export with `users` random users numbered from `first_user`.
+    The last `duplicate_ids` users reuse the ids of the first ones.
+    """
+    rng = random.Random(seed)
+    records = []
+    for number in range(users):
+        user_number = first_user + (number - (users - duplicate_ids) if number >= users - duplicate_ids else number)
+        borrows = []
+        for _ in range(rng.randint(0, 5)):
+            book_id, title, author, genre = rng.choice(BOOKS)
+            borrows.append({
+                'book_id': book_id, 'title': title, 'author': author, 'genre': genre,
+                'borrowed_date': _timestamp(rng, 365),
+                'return_date': None,
+                'rating': rng.randint(1, 5) if rng.random() < 0.6 else None,
+                'completed': rng.random() < 0.5
+            })
+        sessions = [{
+            'book_id': rng.choice(BOOKS)[0],
+            'date': _timestamp(rng, 365),
+            'duration_minutes': rng.randint(5, 120),
+            'pages_read': rng.randint(1, 80),
+            'device': rng.choice(DEVICES)
+        } for _ in range(rng.randint(0, 6))]
+        searches = [{'timestamp': _timestamp(rng, 365), 'query': rng.choice(QUERIES)}
+                    for _ in range(rng.randint(0, 3))]
+        records.append({
+            'user_id': f'U{user_number:06d}',
+            'account': {
+                'registration_date': _timestamp(rng, 800),
+                'account_type': rng.choice(['free', 'premium', 'student']),
+                'subscription_status': rng.choice(['active', 'expired']),
+                'login_frequency': rng.choice(['daily', 'weekly', 'monthly']),
+                'last_login': _timestamp(rng, 120)
+            },
+            'profile': {
+                'age_range': rng.choice(AGE_RANGES),
+                'education_level': rng.choice(EDUCATION_LEVELS),
+                'profession': rng.choice(PROFESSIONS)
+            },
+            'activity': {'books_borrowed': borrows, 'reading_sessions': sessions, 'search_history': searches}
+        })
+    return {'metadata': {'count': users}, 'users': records}
+
+
+@pytest.fixture
+def write_data_file(tmp_path):
+    """Write a library export built by make_library_data and return its path"""
+    def write(name='data.json', data=None, **options):
+        path = tmp_path / name
+        path.write_text(json.dumps(data if data is not None else make_library_data(**options)))
+        return str(path)
+    return write
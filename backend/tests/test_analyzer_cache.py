@@ -0,0 +1,28 @@
+from app.services import analyzer_cache as cache_module
+from app.services.analyzer_cache import AnalyzerCache, analyze_cached_file
+
+
+def test_cache_charges_indexes_built_while_analysing(write_data_file, monkeypatch):
+    path = write_data_file(users=500)
+    cache = AnalyzerCache(max_bytes=1024 ** 3)
+    monkeypatch.setattr(cache_module, 'analyzer_cache', cache)
+    analyzer = cache.get(1, path)
+    table_bytes = cache.stats()['current_bytes']
+
+    analyze_cached_file(1, path, ['usage', 'search'], segment={'age_range': ['18-24']})
+
+    assert analyzer.memory_usage() > table_bytes
+    assert cache.stats()['current_bytes'] == analyzer.memory_usage()
+
+
+def test_cache_evicts_analyzers_that_outgrow_the_budget(write_data_file, monkeypatch):
+    path = write_data_file(users=500)
+    cache = AnalyzerCache(max_bytes=1024 ** 3)
+    monkeypatch.setattr(cache_module, 'analyzer_cache', cache)
+    cache.max_bytes = cache.get(1, path).memory_usage()
+
+    analyze_cached_file(1, path, ['usage'], segment={'age_range': ['18-24']})
+
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['current_bytes'] == 0
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+
+from app.services.library_analysis import DAY_ORDER, LibraryDataAnalyzer
+
+
+def test_index_build_only_blocks_the_same_index_of_the_same_analyzer():
+    analyzer = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+    other = LibraryDataAnalyzer.__new__(LibraryDataAnalyzer)
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_build():
+        building.set()
+        release.wait(5)
+        return 'slow'
+
+    thread = threading.Thread(target=analyzer._lazy_index, args=('slow', slow_build))
+    thread.start()
+    try:
+        assert building.wait(5)
+        # Both return while the slow build still holds its lock
+        assert analyzer._lazy_index('fast', lambda: 'fast') == 'fast'
+        assert other._lazy_index('slow', lambda: 'other') == 'other'
+    finally:
+        release.set()
+        thread.join()
+    assert analyzer._lazy_index('slow', lambda: 'rebuilt') == 'slow'
+
+
+def test_day_of_week_is_memoised_as_codes(write_data_file):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=200), use_cache=False)
+
+    day_of_week = analyzer.derived('session_df', 'day_of_week')
+
+    codes, categories = analyzer._indexes[('derived', 'session_df', 'day_of_week')]
+    assert codes.dtype == 'int8' and not codes.flags.writeable
+    assert categories.tolist() == DAY_ORDER
+    assert day_of_week.astype(object).tolist() == analyzer.session_df['date'].dt.day_name().tolist()
+
+
+
+def test_forked_report_does_not_wait_on_index_locks_held_in_the_parent(write_data_file):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=200), use_cache=False)
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_build():
+        building.set()
+        release.wait(30)
+        return np.zeros(len(analyzer.session_df), dtype=np.int32)
+
+    holder = threading.Thread(target=analyzer._lazy_index, args=(('derived', 'session_df', 'hour'), slow_build))
+    holder.start()
+    reports = []
+    try:
+        assert building.wait(5)
+        reporter = threading.Thread(target=lambda: reports.append(analyzer.generate_comprehensive_report(processes=2)),
+                                    daemon=True)
+        reporter.start()
+        reporter.join(20)
+    finally:
+        release.set()
+        holder.join()
+
+    assert reports
+    assert set(reports[0]['usage_patterns']['hourly_activity']) <= set(range(24))
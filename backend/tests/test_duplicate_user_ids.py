@@ -0,0 +1,40 @@
+from app.services.library_analysis import LibraryDataAnalyzer
+
+
+def test_report_with_repeated_user_ids(write_data_file):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=350, duplicate_ids=50))
+
+    report = analyzer.generate_comprehensive_report()
+
+    assert report['total_users'] == 350
+    genre_by_age = report['user_segments']['genre_preferences_by_age']
+    age_ranges = next(iter(genre_by_age.values())).keys()
+    for age_range in age_ranges:
+        assert abs(sum(shares[age_range] for shares in genre_by_age.values()) - 1) < 0.05
+
+
+def test_borrows_of_repeated_ids_map_to_first_user(write_data_file):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=20, duplicate_ids=5))
+
+    user_rows = analyzer.borrow_user_rows()
+
+    user_ids = analyzer.user_df['user_id'].astype(str).tolist()
+    borrow_ids = analyzer.borrowing_df['user_id'].astype(str).tolist()
+    assert (user_rows >= 0).all()
+    assert all(user_ids[row] == user_id and user_ids.index(user_id) == row
+               for row, user_id in zip(user_rows, borrow_ids))
+
+
+def test_segment_with_repeated_user_ids(write_data_file):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=350, duplicate_ids=50))
+
+    premium = analyzer.segment(account_type=['premium'])
+
+    users = analyzer.user_df
+    assert len(premium.user_df) == int((users['account_type'] == 'premium').sum())
+    # Activity of a repeated id belongs to its first user row
+    first_rows = users.drop_duplicates('user_id')
+    premium_ids = set(first_rows.loc[first_rows['account_type'] == 'premium', 'user_id'])
+    expected = int(analyzer.session_df['user_id'].isin(premium_ids).sum())
+    assert len(premium.session_df) == expected
+    assert premium.analyze_sections(['segments', 'retention'])
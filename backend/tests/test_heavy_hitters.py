@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+
+from app.utils.heavy_hitters import SpaceSavingSketch
+
+CAPACITY = 20
+
+
+def _partition(seed, size):
+    rng = random.Random(seed)
+    # Zipf-like skew: a few heavy items and a long tail of rare ones
+    return [f'item{int(rng.paretovariate(1.1))}' for _ in range(size)]
+
+
+def _sketch(items, chunk_size=500):
+    sketch = SpaceSavingSketch(CAPACITY)
+    for start in range(0, len(items), chunk_size):
+        sketch.update_counts(Counter(items[start:start + chunk_size]))
+    return sketch
+
+
+def test_merged_sketches_keep_the_error_bounds_of_the_combined_stream():
+    partitions = [_partition(seed, 3000) for seed in range(4)]
+    true_counts = Counter(item for items in partitions for item in items)
+
+    merged = _sketch(partitions[0])
+    for items in partitions[1:]:
+        # Sketches travel between partitions as plain states
+        merged.merge(SpaceSavingSketch.from_state(_sketch(items).to_state()))
+
+    total = sum(true_counts.values())
+    assert merged.total == total
+    assert len(merged.counts) <= CAPACITY
+    for item, estimate in merged.counts.items():
+        error = merged.errors[item]
+        assert estimate - error <= true_counts[item] <= estimate
+        assert error <= total / CAPACITY
+    for item, count in true_counts.items():
+        if count > total / CAPACITY:
+            assert item in merged.counts
@@ -0,0 +1,24 @@
+import pytest
+
+from app.services.analyzer_cache import ingest_data_file
+from app.services.library_analysis import LibraryDataAnalyzer
+from app.services.olap_cube import get_file_cube, query_cube
+
+
+def test_ingestion_builds_cube_with_repeated_user_ids(write_data_file):
+    file_path = write_data_file(users=350, duplicate_ids=50)
+
+    state = ingest_data_file(file_path)
+
+    assert state['total_users'] == 350
+    # The stored cube is found without an analyzer loader
+    cube = get_file_cube(1, file_path)
+    totals = query_cube(cube)[0]
+    assert totals['borrows'] == len(LibraryDataAnalyzer(file_path).borrowing_df)
+
+
+def test_ingestion_raises_on_malformed_file(write_data_file):
+    file_path = write_data_file(data={'users': [{'user_id': 'U1'}]})
+
+    with pytest.raises(KeyError):
+        ingest_data_file(file_path)
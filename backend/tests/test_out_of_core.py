@@ -0,0 +1,64 @@
+import os
+import tracemalloc
+from datetime import date
+
+import pytest
+
+from app.services.library_analysis import LibraryDataAnalyzer
+from app.services.out_of_core import MemoryLimitExceeded, SpilledCounters, analyze_out_of_core
+from tests.test_partial_aggregates import in_memory_report
+
+AS_OF = date(2026, 1, 1)
+MEMORY_LIMIT = 2 * 1024 * 1024
+
+
+def test_out_of_core_report_equals_in_memory_report(write_data_file, tmp_path, monkeypatch):
+    path = write_data_file(users=3000)
+    spills = []
+    spill = SpilledCounters.spill
+
+    def counting_spill(self, state):
+        spills.append(state)
+        spill(self, state)
+    monkeypatch.setattr(SpilledCounters, 'spill', counting_spill)
+
+    report = analyze_out_of_core(path, memory_limit=MEMORY_LIMIT, spill_dir=str(tmp_path), as_of=AS_OF)
+
+    assert spills
+    assert report == in_memory_report(LibraryDataAnalyzer(path), AS_OF)
+
+
+def test_out_of_core_peak_memory_stays_below_limit(write_data_file, tmp_path):
+    path = write_data_file(users=3000)
+    assert os.path.getsize(path) > MEMORY_LIMIT
+
+    tracemalloc.start()
+    try:
+        analyze_out_of_core(path, memory_limit=MEMORY_LIMIT, spill_dir=str(tmp_path), as_of=AS_OF)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < MEMORY_LIMIT
+
+
+def test_out_of_core_rejects_limit_too_small_for_a_batch(write_data_file, tmp_path):
+    path = write_data_file(users=10)
+
+    with pytest.raises(MemoryLimitExceeded):
+        analyze_out_of_core(path, memory_limit=256 * 1024, spill_dir=str(tmp_path), as_of=AS_OF)
+
+
+def test_approximate_out_of_core_report_merges_sketches_across_batches(write_data_file, tmp_path, monkeypatch):
+    path = write_data_file(users=3000)
+    monkeypatch.setattr(SpilledCounters, 'spill', lambda self, state: pytest.fail("sketches are never spilled"))
+
+    report = analyze_out_of_core(path, memory_limit=MEMORY_LIMIT, spill_dir=str(tmp_path), as_of=AS_OF,
+                                 approximate=True)
+
+    # Fewer distinct books, authors and words than sketch counters, so the sketches are exact
+    approximation = {**report['content_performance'].pop('approximation'),
+                     **report['search_patterns'].pop('approximation')}
+    assert set(approximation) == {'top_borrowed_books', 'top_authors', 'top_search_terms'}
+    assert all(error['max_overcount'] == 0 for error in approximation.values())
+    assert report == in_memory_report(LibraryDataAnalyzer(path), AS_OF)
@@ -0,0 +1,40 @@
+from datetime import date
+
+import pytest
+
+from app.services.library_analysis import LibraryDataAnalyzer, REPORT_SECTIONS
+from app.services.partial_aggregates import (
+    combine_partial_states,
+    compute_file_partial_state,
+    compute_partial_state,
+    finalize_partial_state
+)
+from tests.conftest import make_library_data
+
+
+def in_memory_report(analyzer, as_of):
+    results = analyzer.analyze_sections([section for _, section in REPORT_SECTIONS], as_of=as_of)
+    report = {'report_date': as_of.strftime('%Y-%m-%d'), 'total_users': len(analyzer.user_df)}
+    report.update({key: results[section] for key, section in REPORT_SECTIONS})
+    return report
+
+
+@pytest.mark.parametrize('as_of', [date(2026, 1, 1), date(2025, 12, 31)])
+def test_finalized_partial_state_equals_in_memory_report(write_data_file, as_of):
+    analyzer = LibraryDataAnalyzer(write_data_file(users=3000))
+
+    report = finalize_partial_state(compute_partial_state(analyzer), as_of)
+
+    assert report == in_memory_report(analyzer, as_of)
+
+
+def test_combined_report_equals_report_of_concatenated_files(write_data_file):
+    as_of = date(2026, 1, 1)
+    partitions = [make_library_data(users=800, seed=seed, first_user=seed * 1000) for seed in range(3)]
+    file_paths = [write_data_file(f'part{index}.json', data=data) for index, data in enumerate(partitions)]
+    concatenated = {'metadata': {}, 'users': [user for data in partitions for user in data['users']]}
+
+    report = combine_partial_states([compute_file_partial_state(path) for path in file_paths], as_of)
+
+    analyzer = LibraryDataAnalyzer(write_data_file('all.json', data=concatenated))
+    assert report == in_memory_report(analyzer, as_of)
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from app.services.library_analysis import count_search_terms
+
+QUERIES = pd.Series(['History of Rome', 'the history of the war', 'of the', None])
+
+
+def test_single_words_skip_stopwords():
+    assert count_search_terms(QUERIES) == {'history': 2, 'rome': 1, 'war': 1}
+
+
+def test_ngrams_keep_inner_stopwords_and_never_bridge_them():
+    assert count_search_terms(QUERIES, ngram=2) == {
+        'history of': 2, 'of rome': 1, 'the history': 1, 'the war': 1
+    }
+    assert count_search_terms(QUERIES, ngram=3) == {
+        'history of rome': 1, 'the history of': 1, 'history of the': 1, 'of the war': 1
+    }
+
+
+def test_ngram_counts_do_not_depend_on_chunking():
+    assert count_search_terms(QUERIES, ngram=2, chunk_size=1) == count_search_terms(QUERIES, ngram=2)
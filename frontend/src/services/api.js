@@ -284,6 +284,20 @@ export const analysisAPI = {
     }
   },
 
+  getAnalysisBatch: async (fileId, sections = []) => {
+    try {
+      const params = new URLSearchParams({ file_id: fileId });
+      sections.forEach((section) => params.append('sections', section));
+      const response = await axiosInstance.get(`/analysis/analysis/batch?${params.toString()}`);
+      return { success: true, data: response.data };
+    } catch (error) {
+      return { 
+        success: false, 
+        error: error.response?.data?.detail || 'Failed to get analysis sections' 
+      };
+    }
+  },
+
   exportReport: async (reportId, format) => {
     try {
       const response = await axiosInstance.get(`/analysis/export-report/${reportId}?format=${format}`, {